@@ -0,0 +1,268 @@
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from cache import LRUCache
+from column_store import ColumnStore
+from scatter import downsample, grid_from_cells, extreme_count, cell_quotas
+from snapshot import (read_store, typed, FILTER_DIMS, FACT_FROM, ROWS_SELECT, ROW_MEASURES, ROW_TEXT,
+                      CUBE_SELECT, CUBE_DIMS, CUBE_MEASURES)
+
+# Colonnes au niveau ligne utilisées par le nuage Remise vs Profit (grille / échantillonnage : SCATTER_XY)
+SCATTER_XY = ["discount","profit","sales"]
+SCATTER_COLS = ["discount","profit","sales","product_name","category","sub_category",
+                "customer_name","segment","priority"]
+
+FACT_COLUMNS = {"market": "g.market", "region": "g.region", "segment": "c.segment",
+                "category": "p.category", "sub_category": "p.sub_category", "ship_mode": "s.ship_mode",
+                "speed_bucket": "s.speed_bucket", "priority": "pr.priority",
+                "product_name": "p.product_name", "customer_name": "c.customer_name"}
+DIM_TABLES = {"market": "dim_geography", "region": "dim_geography", "segment": "dim_customer",
+              "category": "dim_product", "ship_mode": "dim_ship", "priority": "dim_priority"}
+
+# Échantillon stratifié en pushdown (cf. scatter.stratified_sample) : lignes filtrées, extrêmes (cell = -1)
+# puis cellule remise x profit des autres, bornes calculées hors extrêmes ; valeurs absentes comptées à 0
+SAMPLE_CELLS = """
+WITH r AS (
+    SELECT {cols}, f.order_id AS _id, f.order_line AS _line
+    {fact_from} {where}
+), e AS (
+    SELECT r.*, LEAST(
+        row_number() OVER (ORDER BY COALESCE(profit, 0), _id, _line),
+        row_number() OVER (ORDER BY COALESCE(profit, 0) DESC, _id DESC, _line DESC),
+        row_number() OVER (ORDER BY COALESCE(sales, 0), _id, _line),
+        row_number() OVER (ORDER BY COALESCE(sales, 0) DESC, _id DESC, _line DESC)) <= :k AS extreme
+    FROM r
+), b AS (
+    SELECT COALESCE(min(discount), 0) AS dlo, COALESCE(max(discount), 1) AS dhi,
+           COALESCE(min(profit), 0) AS plo, COALESCE(max(profit), 1) AS phi
+    FROM e WHERE NOT extreme
+), c AS (
+    SELECT e.*, CASE WHEN extreme THEN -1 ELSE
+        (LEAST(GREATEST(width_bucket(COALESCE(profit, 0), plo, GREATEST(phi, plo + 1e-9), :bins), 1), :bins) - 1) * :bins
+        + LEAST(GREATEST(width_bucket(COALESCE(discount, 0), dlo, GREATEST(dhi, dlo + 1e-9), :bins), 1), :bins) - 1
+    END AS cell
+    FROM e CROSS JOIN b
+)"""
+
+def load_df(engine):
+    return typed(pd.read_sql(ROWS_SELECT, engine), ROW_MEASURES, ROW_TEXT)
+
+def rows_to_cube(rows: pd.DataFrame) -> pd.DataFrame:
+    r = rows.assign(yyyymm=rows["order_date"].dt.year * 100 + rows["order_date"].dt.month,
+                    shipping_days_n=rows["shipping_days"].notna().astype(int))
+    return (r.groupby(CUBE_DIMS, as_index=False, dropna=False)
+              .agg(sales=("sales","sum"), profit=("profit","sum"), quantity=("quantity","sum"),
+                   shipping_days_sum=("shipping_days","sum"), shipping_days_n=("shipping_days_n","sum"),
+                   n_rows=("sales","size")))
+
+def load_cube(engine, rows: pd.DataFrame) -> pd.DataFrame:
+    try:
+        cube = pd.read_sql(CUBE_SELECT, engine)
+    except Exception:
+        # ETL antérieur au cube : on le calcule depuis les lignes
+        return rows_to_cube(rows)
+    return typed(cube, CUBE_MEASURES, CUBE_DIMS[1:])
+
+def _yyyymm(ts) -> int:
+    return ts.year * 100 + ts.month
+
+def _date_key(ts) -> int:
+    return ts.year * 10000 + ts.month * 100 + ts.day
+
+def full_months(start, end):
+    # bornes (yyyymm) des mois entièrement couverts par [start, end] ; lo > hi si aucun
+    full_lo = _yyyymm(start if start.day == 1 else start + pd.offsets.MonthBegin(1))
+    full_hi = _yyyymm(end if (end + pd.Timedelta(days=1)).day == 1 else end - pd.offsets.MonthEnd(1))
+    return full_lo, full_hi
+
+# -------------------- Mode mémoire --------------------
+class MemoryBackend:
+    # tout l'historique en mémoire : lignes + cube en stockage colonnaire (bitmaps, index de dates).
+    # snapshot : dossier d'une version publiée par l'ETL (cf. snapshot.py) — fichiers mappés en mémoire
+    # et partagés entre workers, sans requête ni tri au démarrage ; sinon lecture depuis la base.
+    # cache_bytes : plafond du cache de sélections de chaque stockage (positions gardées, en octets)
+    def __init__(self, engine, cache_size: int = 128, snapshot: str = None, cache_bytes: int = 256 * 2**20):
+        if snapshot:
+            rows, rows_bits = read_store(os.path.join(snapshot, "rows"))
+            cube, cube_bits = read_store(os.path.join(snapshot, "cube"))
+            self.rows = ColumnStore(rows, FILTER_DIMS, "order_date", cache_size, rows_bits, cache_bytes)
+            self.cube = ColumnStore(cube, FILTER_DIMS, "yyyymm", cache_size, cube_bits, cache_bytes)
+            return
+        self.rows = ColumnStore(load_df(engine), FILTER_DIMS, "order_date", cache_size, cache_bytes=cache_bytes)
+        self.cube = ColumnStore(load_cube(engine, self.rows.frame), FILTER_DIMS, "yyyymm", cache_size,
+                                cache_bytes=cache_bytes)
+
+    def options(self, col: str) -> list:
+        return self.rows.options(col)
+
+    def clear_cache(self):
+        self.rows.clear_cache()
+        self.cube.clear_cache()
+
+    def date_bounds(self):
+        return tuple(pd.to_datetime(d) for d in self.rows.date_bounds())
+
+    def filter_rows(self, filters: dict, start_date, end_date, columns: list = None) -> pd.DataFrame:
+        # une seule sélection de lignes (bitmaps + tranche de dates, mise en cache) puis une seule copie
+        return self.rows.take(self.rows.select(filters, start_date or None, end_date or None), columns)
+
+    def scatter(self, filters: dict, start_date, end_date, max_points: int, mode: str, bins: int):
+        # seules les 3 colonnes numériques sont rassemblées pour toute la sélection ; les colonnes texte
+        # (survol) ne le sont que pour les lignes envoyées
+        sel = self.rows.select(filters, start_date or None, end_date or None)
+        xy = self.rows.take(sel, SCATTER_XY).reset_index(drop=True)
+        if len(xy) <= max_points:
+            return "rows", self.rows.take(sel, SCATTER_COLS), len(xy)
+        kind, payload = downsample(xy, max_points, mode, bins)
+        if kind == "rows":
+            pos = payload.index.to_numpy()
+            payload = self.rows.take(pos + sel.start if isinstance(sel, slice) else sel[pos], SCATTER_COLS)
+        return kind, payload, len(xy)
+
+    def cube_slice(self, filters: dict, start_date, end_date) -> pd.DataFrame:
+        # Mois entièrement couverts par la période => cube ; mois de bord partiels => lignes ré-agrégées au même grain
+        date_min, date_max = self.date_bounds()
+        start = pd.to_datetime(start_date) if start_date else date_min
+        end = pd.to_datetime(end_date) if end_date else date_max
+        full_lo, full_hi = full_months(start, end)
+        if full_lo > full_hi:
+            return rows_to_cube(self.filter_rows(filters, start, end))
+        parts = [self.cube.take(self.cube.select(filters, full_lo, full_hi))]
+        if _yyyymm(start) < full_lo:
+            parts.append(rows_to_cube(self.filter_rows(filters, start, start + pd.offsets.MonthEnd(0))))
+        if _yyyymm(end) > full_hi:
+            parts.append(rows_to_cube(self.filter_rows(filters, end.replace(day=1), end)))
+        return pd.concat(parts, ignore_index=True)
+
+# -------------------- Mode pushdown --------------------
+class PushdownBackend:
+    # rien n'est chargé au démarrage : chaque combinaison de filtres devient une requête d'agrégat
+    # paramétrée exécutée par Postgres (cube pour les mois complets, faits pour les mois de bord),
+    # résultats gardés dans un cache TTL borné => mémoire constante quelle que soit la taille des faits
+    def __init__(self, engine, cache_size: int = 128, ttl: float = 60):
+        self.engine = engine
+        self._cache = LRUCache(cache_size, ttl)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def _read(self, sql: str, params: dict = None) -> pd.DataFrame:
+        params = params or {}
+        key = (sql, tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items())))
+        def run():
+            with self.engine.connect() as conn:
+                return pd.read_sql(text(sql), conn, params=params)
+        return self._cache.get_or_compute(key, run)
+
+    @staticmethod
+    def _where(filters: dict, columns: dict, params: dict) -> str:
+        clauses = []
+        for col in FILTER_DIMS:
+            if filters.get(col):
+                params[col] = list(filters[col])
+                clauses.append(f"{columns.get(col, col)} = ANY(:{col})")
+        return "".join(f" AND {c}" for c in clauses)
+
+    def options(self, col: str) -> list:
+        q = f"SELECT DISTINCT {col} FROM {DIM_TABLES[col]} WHERE {col} IS NOT NULL ORDER BY 1"
+        return [str(v).strip() for v in self._read(q)[col]]
+
+    def date_bounds(self):
+        # dates de commande seules (comme le mode mémoire) : dim_date contient aussi les dates d'expédition ;
+        # première / dernière date de dim_date ayant des faits (sondes sur la partition du jour)
+        has_facts = "EXISTS (SELECT 1 FROM fact_sales f WHERE f.order_date_key = d.date_key)"
+        b = self._read(f"""
+            SELECT (SELECT d.date FROM dim_date d WHERE {has_facts} ORDER BY d.date_key LIMIT 1) AS lo,
+                   (SELECT d.date FROM dim_date d WHERE {has_facts} ORDER BY d.date_key DESC LIMIT 1) AS hi
+        """)
+        return pd.to_datetime(b["lo"].iloc[0]), pd.to_datetime(b["hi"].iloc[0])
+
+    def _period(self, start_date, end_date):
+        date_min, date_max = self.date_bounds()
+        return (pd.to_datetime(start_date) if start_date else date_min,
+                pd.to_datetime(end_date) if end_date else date_max)
+
+    def _sample(self, where: str, params: dict, max_points: int, bins: int) -> pd.DataFrame:
+        # même échantillon stratifié que scatter.stratified_sample, calculé par Postgres : extrêmes
+        # (rangs sur profit / ventes), cellules remise x profit (width_bucket) sur le reste ; quotas par
+        # cellule calculés ici (cell_quotas) sur les effectifs, puis row_number() par cellule
+        cols = ", ".join(f"{FACT_COLUMNS.get(c, 'f.' + c)} AS {c}" for c in SCATTER_COLS)
+        k = extreme_count(max_points)
+        cells_cte = SAMPLE_CELLS.format(cols=cols, fact_from=FACT_FROM, where=where)
+        params = {**params, "k": k, "bins": bins}
+        counts = self._read(f"{cells_cte} SELECT cell, count(*) AS n FROM c GROUP BY cell", params)
+        n_extreme = int(counts.loc[counts["cell"] < 0, "n"].sum())
+        cell_counts = np.zeros(bins * bins, dtype=np.int64)
+        inner = counts[counts["cell"] >= 0]
+        cell_counts[inner["cell"].to_numpy(int)] = inner["n"].to_numpy(int)
+        quota = cell_quotas(cell_counts, max(max_points - n_extreme, 0))
+        picked = np.flatnonzero(quota)
+        q = f"""{cells_cte}
+        SELECT {', '.join(SCATTER_COLS)} FROM (
+            SELECT c.*, row_number() OVER (PARTITION BY cell ORDER BY md5(_id || ':' || _line)) AS rk FROM c
+        ) s JOIN unnest(CAST(:cells AS int[]), CAST(:quotas AS int[])) AS q(cell, quota)
+          ON q.cell = s.cell AND s.rk <= q.quota
+        """
+        return self._read(q, {**params, "cells": [-1] + picked.tolist(),
+                              "quotas": [n_extreme] + quota[picked].tolist()})
+
+    def scatter(self, filters: dict, start_date, end_date, max_points: int, mode: str, bins: int):
+        # sous le budget : lignes ; au-delà : grille calculée par Postgres (width_bucket)
+        # ou échantillon stratifié (mode "sample") — la réponse reste bornée
+        start, end = self._period(start_date, end_date)
+        params = {"k_lo": _date_key(start), "k_hi": _date_key(end)}
+        where = f"WHERE f.order_date_key BETWEEN :k_lo AND :k_hi{self._where(filters, FACT_COLUMNS, params)}"
+        n = int(self._read(f"SELECT count(*) AS n {FACT_FROM} {where}", params)["n"].iloc[0])
+        if n <= max_points or mode == "sample":
+            if n <= max_points:
+                cols = ", ".join(f"{FACT_COLUMNS.get(c, 'f.' + c)} AS {c}" for c in SCATTER_COLS)
+                df = self._read(f"SELECT {cols} {FACT_FROM} {where}", params).copy()
+            else:
+                df = self._sample(where, params, max_points, bins).copy()
+            for col in ["discount","profit","sales"]:
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+            return "rows", df, n
+        q = f"""
+        WITH r AS (SELECT f.discount, f.profit, f.sales {FACT_FROM} {where}
+                   AND f.discount IS NOT NULL AND f.profit IS NOT NULL),
+             b AS (SELECT min(discount) AS dlo, max(discount) AS dhi, min(profit) AS plo, max(profit) AS phi FROM r)
+        SELECT LEAST(width_bucket(r.discount, b.dlo, GREATEST(b.dhi, b.dlo + 1e-9), :bins), :bins) - 1 AS ix,
+               LEAST(width_bucket(r.profit, b.plo, GREATEST(b.phi, b.plo + 1e-9), :bins), :bins) - 1 AS iy,
+               SUM(r.sales) AS sales, COUNT(*) AS n,
+               MIN(b.dlo) AS dlo, MIN(b.dhi) AS dhi, MIN(b.plo) AS plo, MIN(b.phi) AS phi
+        FROM r CROSS JOIN b
+        GROUP BY 1, 2
+        """
+        cells = self._read(q, {**params, "bins": bins})
+        bounds = tuple(float(cells[c].iloc[0]) if len(cells) else float("nan") for c in ["dlo","dhi","plo","phi"])
+        return "grid", grid_from_cells(cells, bounds, bins), n
+
+    def cube_slice(self, filters: dict, start_date, end_date) -> pd.DataFrame:
+        start, end = self._period(start_date, end_date)
+        full_lo, full_hi = full_months(start, end)
+        params = {"m_lo": full_lo, "m_hi": full_hi, "k_lo": _date_key(start), "k_hi": _date_key(end)}
+        dims = ["yyyymm","region","category","sub_category","ship_mode","speed_bucket"]
+        q = f"""
+        SELECT {', '.join(dims)},
+               SUM(sales) AS sales, SUM(profit) AS profit, SUM(quantity) AS quantity,
+               SUM(shipping_days_sum) AS shipping_days_sum, SUM(shipping_days_n) AS shipping_days_n,
+               SUM(n_rows) AS n_rows
+        FROM (
+            SELECT {', '.join(dims)}, sales, profit, quantity, shipping_days_sum, shipping_days_n, n_rows
+            FROM agg_sales_cube
+            WHERE yyyymm BETWEEN :m_lo AND :m_hi{self._where(filters, {}, params)}
+            UNION ALL
+            SELECT d.yyyymm, {', '.join(FACT_COLUMNS[c] for c in dims[1:])},
+                   f.sales, f.profit, f.quantity, f.shipping_days,
+                   (f.shipping_days IS NOT NULL)::int, 1
+            {FACT_FROM}
+            WHERE f.order_date_key BETWEEN :k_lo AND :k_hi
+              AND d.yyyymm NOT BETWEEN :m_lo AND :m_hi{self._where(filters, FACT_COLUMNS, params)}
+        ) u
+        GROUP BY {', '.join(dims)}
+        """
+        cs = self._read(q, params).copy()
+        for col in CUBE_MEASURES:
+            cs[col] = pd.to_numeric(cs[col], errors="coerce")
+        return cs
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    # cache borné (éviction du moins récemment utilisé), partagé entre les threads du serveur Dash ;
+    # ttl (secondes) optionnel : une entrée expirée est recalculée ; clock : horloge (secondes), injectable ;
+    # maxbytes optionnel : plafond de la somme des `.nbytes` des valeurs (tableaux numpy), l'entrée la plus
+    # récente étant toujours gardée
+    def __init__(self, maxsize: int = 128, ttl: float = None, clock=time.monotonic, maxbytes: int = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            expires, value = self._data[key]
+            if expires is not None and expires < self.clock():
+                self._drop(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        expires = self.clock() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (expires, value)
+            self.nbytes += getattr(value, "nbytes", 0)
+            while len(self._data) > self.maxsize or (
+                    self.maxbytes is not None and self.nbytes > self.maxbytes and len(self._data) > 1):
+                self._drop(next(iter(self._data)))
+
+    def _drop(self, key):
+        self.nbytes -= getattr(self._data.pop(key)[1], "nbytes", 0)
+
+    def get_or_compute(self, key, compute):
+        # un seul calcul par clé absente : les threads qui demandent la même clé pendant le calcul
+        # (callbacks Dash déclenchés ensemble) attendent son résultat au lieu de le refaire
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = _Pending()
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+        try:
+            pending.value = compute()
+            self.put(key, pending.value)
+            return pending.value
+        except BaseException as exc:
+            pending.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+class _Pending:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+_MISSING = object()
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+from cache import LRUCache
+
+class ColumnStore:
+    # Stockage colonnaire en mémoire pour le filtrage du dashboard :
+    # - lignes triées par date => une période = une tranche contiguë (recherche dichotomique)
+    # - chaque dimension filtrable est encodée par dictionnaire, avec un bitmap compressé par valeur
+    # - une combinaison de filtres = OR des bitmaps par dimension, AND entre dimensions,
+    #   puis une seule sélection de positions (aucune copie intermédiaire), mise en cache LRU bornée en
+    #   octets (cache_bytes) ; sans filtre de dimension, la sélection est la tranche de dates elle-même
+    #   (slice, rien à matérialiser ni à garder)
+    # bitmaps : {dimension: {valeur: bitmap}} déjà calculés pour `frame` (jeu publié par l'ETL, trié par date)
+    def __init__(self, frame: pd.DataFrame, dims: list, date_col: str, cache_size: int = 128,
+                 bitmaps: dict = None, cache_bytes: int = 256 * 2**20):
+        if frame[date_col].is_monotonic_increasing:
+            self.frame = frame
+        else:
+            order = np.argsort(frame[date_col].to_numpy(), kind="stable")
+            self.frame = frame.take(order).reset_index(drop=True)
+            bitmaps = None  # calculés sur l'ordre d'origine
+        self.dims = list(dims)
+        self.date_col = date_col
+        self.dates = self.frame[date_col].to_numpy()
+        self.n = len(self.frame)
+        # NaT triées en fin : exclues des bornes par défaut (comme une comparaison de dates)
+        self.n_dated = int((~pd.isna(self.dates)).sum())
+        self.index, self.bitmaps = {}, {}
+        for col in self.dims:
+            if bitmaps is not None:
+                uniques, self.bitmaps[col] = list(bitmaps[col]), list(bitmaps[col].values())
+            else:
+                codes, uniques = pd.factorize(self.frame[col])
+                self.bitmaps[col] = [np.packbits(codes == i) for i in range(len(uniques))]
+            self.index[col] = {v: i for i, v in enumerate(uniques)}
+        self._empty = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+        self._cache = LRUCache(cache_size, maxbytes=cache_bytes)
+
+    def options(self, col: str) -> list:
+        return sorted(self.index[col])
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def date_bounds(self):
+        if not self.n_dated:
+            return None, None
+        return self.dates[0], self.dates[self.n_dated - 1]
+
+    def _key(self, value):
+        if self.dates.dtype.kind == "M":
+            return pd.Timestamp(value).to_datetime64().astype(self.dates.dtype)
+        return value
+
+    def _bitmap(self, col: str, values) -> np.ndarray:
+        bits = self._empty
+        for v in values:
+            i = self.index[col].get(v)
+            if i is not None:
+                bits = bits | self.bitmaps[col][i]
+        return bits
+
+    def _range(self, lo, hi) -> slice:
+        i = 0 if lo is None else int(np.searchsorted(self.dates[:self.n_dated], self._key(lo), "left"))
+        j = self.n_dated if hi is None else int(np.searchsorted(self.dates[:self.n_dated], self._key(hi), "right"))
+        return slice(i, max(i, j))
+
+    def select(self, filters: dict, lo=None, hi=None):
+        # filters : dimension -> valeurs retenues (None / [] = pas de filtre) ; lo/hi : bornes incluses
+        # -> slice (période seule) ou positions (np.ndarray), à passer à take
+        active = tuple((col, tuple(sorted(map(str, filters[col]))))
+                       for col in self.dims if filters.get(col))
+        if not active:
+            return self._range(lo, hi)
+        key = (active, None if lo is None else str(lo), None if hi is None else str(hi))
+        return self._cache.get_or_compute(key, lambda: self._select(filters, active, self._range(lo, hi)))
+
+    def _select(self, filters: dict, active, rows: slice) -> np.ndarray:
+        i, j = rows.start, rows.stop
+        if j <= i:
+            return np.empty(0, dtype=np.int64)
+        bits = None
+        for col, _ in active:
+            b = self._bitmap(col, filters[col])
+            bits = b if bits is None else bits & b
+        # dépaquetage limité aux octets couvrant la période
+        b0, b1 = i // 8, (j + 7) // 8
+        pos = np.flatnonzero(np.unpackbits(bits[b0:b1])) + b0 * 8
+        return pos[(pos >= i) & (pos < j)]
+
+    def take(self, idx, columns: list = None) -> pd.DataFrame:
+        # idx : sortie de select ; une tranche est servie sans copie (copy-on-write)
+        frame = self.frame if columns is None else self.frame[columns]
+        return frame.iloc[idx]
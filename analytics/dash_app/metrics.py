@@ -0,0 +1,173 @@
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, suppress
+from datetime import datetime, timezone
+import flask
+
+# un fichier par processus (workers gunicorn) : aucun worker n'écrase les compteurs, le fichier temporaire ni
+# la rotation d'un autre ; les séries Prometheus portent un label pid (sum by (callback) pour le total)
+LOG_FILE = "dash_metrics.{pid}.jsonl"
+PROM_FILE = "dash.{pid}.prom"
+PROM_NAME = re.compile(r"dash\.(\d+)\.prom")
+LOG_MAX_BYTES = 50 * 2**20   # au-delà, le log courant devient .1 (une seule génération gardée)
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _remove_stale(out_dir: str):
+    # compteurs figés d'un processus terminé (worker redémarré) retirés de l'export
+    for name in os.listdir(out_dir):
+        m = PROM_NAME.fullmatch(name)
+        if m and not _alive(int(m.group(1))):
+            with suppress(FileNotFoundError):   # déjà retiré par un autre worker
+                os.remove(os.path.join(out_dir, name))
+
+class CallbackMetrics:
+    # Mesures des callbacks Dash : durée totale, durée par figure, nb de lignes filtrées, taille de
+    # la réponse. Un appel = une ligne JSON ; totaux cumulés exposés dans un fichier Prometheus
+    # réécrit au plus toutes les `flush_every` secondes. out_dir "" => rien n'est mesuré.
+    def __init__(self, out_dir: str, flush_every: float = 10.0):
+        self.out_dir = out_dir
+        self.flush_every = flush_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._calls = defaultdict(lambda: {"count": 0, "seconds": 0.0, "bytes": 0, "errors": 0})
+        self._figures = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        self._last_rows = {}
+        self._flushed = 0.0
+        self._pid = None
+        self._server = False
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+    def attach(self, server):
+        # taille de la réponse lue sur la réponse HTTP déjà sérialisée par Dash (hook Flask after_request)
+        # plutôt que de re-sérialiser chaque sortie ; sans serveur (appel direct, benchmark) : pas de taille
+        if self.out_dir:
+            server.after_request(self._after_request)
+            self._server = True
+
+    def _after_request(self, response):
+        rec = flask.g.pop("dash_metrics", None)
+        if rec is not None:
+            rec["response_bytes"] = response.calculate_content_length() or 0
+            self._record(rec)
+        return response
+
+    def instrument(self, name: str):
+        # décorateur du callback : placé sous @app.callback (Dash enregistre la fonction enveloppée)
+        def wrap(fn):
+            if not self.out_dir:
+                return fn
+
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                rec = {"callback": name, "figures": {}, "rows": None}
+                self._local.rec = rec
+                t0 = time.perf_counter()
+                error = None
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as exc:
+                    error = f"{type(exc).__name__}: {exc}"
+                    raise
+                finally:
+                    self._local.rec = None
+                    rec["seconds"] = round(time.perf_counter() - t0, 4)
+                    rec["response_bytes"] = None
+                    rec["error"] = error
+                    if self._server and flask.has_request_context():
+                        flask.g.dash_metrics = rec   # enregistré par _after_request, taille connue
+                    else:
+                        self._record(rec)
+            return inner
+        return wrap
+
+    @contextmanager
+    def figure(self, name: str):
+        rec = getattr(self._local, "rec", None)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            if rec is not None:
+                rec["figures"][name] = round(rec["figures"].get(name, 0.0) + time.perf_counter() - t0, 4)
+
+    def rows(self, n: int):
+        rec = getattr(self._local, "rec", None)
+        if rec is not None:
+            rec["rows"] = int(n)
+
+    def _record(self, rec: dict):
+        name = rec["callback"]
+        line = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), **rec}
+        with self._lock:
+            if self._pid != os.getpid():
+                # 1er appel du processus (objet créé avant le fork des workers avec --preload) : compteurs
+                # hérités du parent remis à zéro
+                self._pid = os.getpid()
+                self._calls.clear()
+                self._figures.clear()
+                self._last_rows.clear()
+                self._flushed = 0.0
+                _remove_stale(self.out_dir)
+            c = self._calls[name]
+            c["count"] += 1
+            c["seconds"] += rec["seconds"]
+            c["bytes"] += rec["response_bytes"] or 0
+            c["errors"] += rec["error"] is not None
+            for fig, secs in rec["figures"].items():
+                f = self._figures[(name, fig)]
+                f["count"] += 1
+                f["seconds"] += secs
+            if rec["rows"] is not None:
+                self._last_rows[name] = rec["rows"]
+            path = os.path.join(self.out_dir, LOG_FILE.format(pid=self._pid))
+            if os.path.exists(path) and os.path.getsize(path) > LOG_MAX_BYTES:
+                os.replace(path, f"{path}.1")
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(line) + "\n")
+            if time.monotonic() - self._flushed >= self.flush_every:
+                self._write_prometheus()
+                self._flushed = time.monotonic()
+
+    def prometheus(self) -> str:
+        out = []
+
+        def metric(name, kind, help_, samples):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(f"{name}{{{labels}}} {value}" for labels, value in samples)
+
+        pid = f'pid="{os.getpid()}"'
+        calls = [(f'callback="{n}",{pid}', c) for n, c in sorted(self._calls.items())]
+        figs = [(f'callback="{n}",figure="{f}",{pid}', c) for (n, f), c in sorted(self._figures.items())]
+        metric("dash_callback_calls_total", "counter", "Appels du callback.", [(l, c["count"]) for l, c in calls])
+        metric("dash_callback_errors_total", "counter", "Appels en erreur.", [(l, c["errors"]) for l, c in calls])
+        metric("dash_callback_seconds_total", "counter", "Temps cumulé du callback.",
+               [(l, c["seconds"]) for l, c in calls])
+        metric("dash_callback_response_bytes_total", "counter", "Octets JSON renvoyés au navigateur.",
+               [(l, c["bytes"]) for l, c in calls])
+        metric("dash_figure_seconds_total", "counter", "Temps de calcul cumulé par figure.",
+               [(l, c["seconds"]) for l, c in figs])
+        metric("dash_figure_calls_total", "counter", "Calculs par figure.", [(l, c["count"]) for l, c in figs])
+        metric("dash_callback_filtered_rows", "gauge", "Lignes de faits retenues par le dernier appel.",
+               [(f'callback="{n}",{pid}', v) for n, v in sorted(self._last_rows.items())])
+        return "\n".join(out) + "\n"
+
+    def _write_prometheus(self):
+        path = os.path.join(self.out_dir, PROM_FILE.format(pid=self._pid))
+        with open(f"{path}.tmp", "w", encoding="utf-8") as fh:
+            fh.write(self.prometheus())
+        os.replace(f"{path}.tmp", path)
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Nuage Remise vs Profit : au-delà d'un budget de points, le serveur envoie soit une grille 2D
+# (ventes sommées par cellule remise x profit), soit un échantillon stratifié qui garde les extrêmes.
+HOVER_COLS = ["product_name","category","sub_category","customer_name","segment","priority"]
+TITLE = "Remise vs Profit"
+
+def _edges(lo: float, hi: float, bins: int) -> np.ndarray:
+    if not np.isfinite(lo) or not np.isfinite(hi):
+        lo, hi = 0.0, 1.0
+    if hi <= lo:
+        hi = lo + 1e-9
+    return np.linspace(lo, hi, bins + 1)
+
+def _cell(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    bins = len(edges) - 1
+    return np.clip(((values - edges[0]) / (edges[-1] - edges[0]) * bins).astype(np.int64), 0, bins - 1)
+
+def grid_from_rows(dff: pd.DataFrame, bins: int) -> dict:
+    d = dff[["discount","profit","sales"]].dropna(subset=["discount","profit"])
+    x, y = d["discount"].to_numpy(float), d["profit"].to_numpy(float)
+    x_edges = _edges(x.min() if len(x) else 0.0, x.max() if len(x) else 1.0, bins)
+    y_edges = _edges(y.min() if len(y) else 0.0, y.max() if len(y) else 1.0, bins)
+    flat = _cell(y, y_edges) * bins + _cell(x, x_edges)
+    sales = np.bincount(flat, weights=d["sales"].fillna(0).to_numpy(float), minlength=bins * bins)
+    count = np.bincount(flat, minlength=bins * bins)
+    return _grid(x_edges, y_edges, sales.reshape(bins, bins), count.reshape(bins, bins))
+
+def grid_from_cells(cells: pd.DataFrame, bounds: tuple, bins: int) -> dict:
+    # cells : (ix, iy, sales, n) agrégés côté base ; bounds : (discount min/max, profit min/max)
+    x_edges, y_edges = _edges(bounds[0], bounds[1], bins), _edges(bounds[2], bounds[3], bins)
+    sales, count = np.zeros((bins, bins)), np.zeros((bins, bins), dtype=np.int64)
+    iy, ix = cells["iy"].to_numpy(int), cells["ix"].to_numpy(int)
+    sales[iy, ix] = cells["sales"].to_numpy(float)
+    count[iy, ix] = cells["n"].to_numpy(int)
+    return _grid(x_edges, y_edges, sales, count)
+
+def _grid(x_edges, y_edges, sales, count) -> dict:
+    return {"x": (x_edges[:-1] + x_edges[1:]) / 2, "y": (y_edges[:-1] + y_edges[1:]) / 2,
+            "sales": np.where(count > 0, sales, np.nan), "count": count}
+
+def extreme_count(max_points: int) -> int:
+    # extrêmes gardés par colonne (profit, ventes) et par bout : ~10 % du budget au total
+    return max(max_points, 0) // 40
+
+def cell_quotas(counts: np.ndarray, budget: int) -> np.ndarray:
+    # points par cellule, somme = min(budget, total) : un point par cellule non vide tant que le budget
+    # le permet (cellules les plus peuplées d'abord), le reste au prorata (plus forts restes)
+    counts = np.asarray(counts, dtype=np.int64)
+    quota = np.zeros(len(counts), dtype=np.int64)
+    total, cells = int(counts.sum()), int((counts > 0).sum())
+    if budget >= total:
+        return counts.copy()
+    if budget <= cells:
+        quota[np.argsort(-counts, kind="stable")[:max(budget, 0)]] = 1
+        return quota
+    quota[counts > 0] = 1
+    extra = (counts - quota) * (budget - cells) / (total - cells)
+    quota += np.floor(extra).astype(np.int64)
+    left = budget - int(quota.sum())
+    quota[np.argsort(-(extra - np.floor(extra)), kind="stable")[:left]] += 1
+    return quota
+
+def stratified_sample(dff: pd.DataFrame, max_points: int, bins: int, seed: int = 0) -> pd.DataFrame:
+    # extrêmes conservés (plus gros profits/pertes et ventes), le reste du budget réparti entre cellules
+    # remise x profit (cell_quotas) ; jamais plus de max_points lignes
+    if len(dff) <= max_points:
+        return dff
+    k = extreme_count(max_points)
+    keep = np.zeros(len(dff), dtype=bool)
+    if k:
+        for col in ["profit","sales"]:
+            order = np.argsort(np.nan_to_num(dff[col].to_numpy(float), nan=0.0), kind="stable")
+            keep[order[:k]] = True
+            keep[order[-k:]] = True
+    rest = np.flatnonzero(~keep)
+    budget = max(max_points - int(keep.sum()), 0)
+    if budget and len(rest):
+        x = dff["discount"].to_numpy(float)[rest]
+        y = dff["profit"].to_numpy(float)[rest]
+        x_edges = _edges(np.nanmin(x), np.nanmax(x), bins)
+        y_edges = _edges(np.nanmin(y), np.nanmax(y), bins)
+        cell = _cell(np.nan_to_num(y), y_edges) * bins + _cell(np.nan_to_num(x), x_edges)
+        counts = np.bincount(cell, minlength=bins * bins)
+        quota = cell_quotas(counts, budget)
+        # rang aléatoire dans la cellule : on garde les `quota` premiers
+        rng = np.random.default_rng(seed)
+        order = np.lexsort((rng.random(len(rest)), cell))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        rank = np.empty(len(rest), dtype=np.int64)
+        rank[order] = np.arange(len(rest)) - starts[cell[order]]
+        keep[rest[rank < quota[cell]]] = True
+    return dff[keep]
+
+def downsample(dff: pd.DataFrame, max_points: int, mode: str, bins: int):
+    # -> ("rows", DataFrame) ou ("grid", dict)
+    if len(dff) <= max_points:
+        return "rows", dff
+    if mode == "sample":
+        return "rows", stratified_sample(dff, max_points, bins)
+    return "grid", grid_from_rows(dff, bins)
+
+def discount_profit_figure(kind: str, payload, n_total: int):
+    if kind == "grid":
+        fig = go.Figure(go.Heatmap(
+            x=payload["x"], y=payload["y"], z=payload["sales"], customdata=payload["count"],
+            colorscale="Blues", colorbar=dict(title="Ventes"),
+            hovertemplate="Remise %{x:.2f}<br>Profit %{y:,.0f}<br>Ventes %{z:,.0f}<br>Lignes %{customdata}<extra></extra>"))
+        fig.update_layout(xaxis_title="discount", yaxis_title="profit")
+        n_points = int((payload["count"] > 0).sum())
+        label = "ventes par cellule"
+    else:
+        hover = [c for c in HOVER_COLS if c in payload.columns]
+        fig = px.scatter(payload, x="discount", y="profit", size="sales", hover_data=hover)
+        n_points = len(payload)
+        label = "taille = ventes" if n_points == n_total else "échantillon, taille = ventes"
+    fig.update_layout(margin=dict(l=20,r=20,t=50,b=20), height=360)
+    # taille de la réponse et nb de points affichés, pour garder un œil sur le budget
+    kb = len(fig.to_json()) / 1024
+    fig.update_layout(title=f"{TITLE} ({label})<br><sup>{n_points:,} points / {n_total:,} lignes — {kb:,.0f} Ko</sup>")
+    return fig
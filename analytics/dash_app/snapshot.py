@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Jeu publié par l'ETL (etl/publish.py) : <dir>/CURRENT désigne la version courante <dir>/v<date>/,
+# qui contient rows.arrow / cube.arrow et leurs bitmaps (*.index.arrow).
+# Fichiers mappés en mémoire : les workers d'un même serveur partagent les mêmes pages (cache de l'OS)
+# au lieu de garder chacun leur copie du jeu.
+# Ce module définit le jeu une seule fois (dimensions filtrables, pointeur, requêtes, typage) pour
+# l'écrivain (etl/publish.py, qui l'importe) et les lecteurs (backends.py) : ils ne peuvent pas diverger.
+CURRENT = "CURRENT"
+FILTER_DIMS = ["market","region","segment","category","ship_mode","priority"]
+
+# Jointures sur clés de substitution entières ; les clés naturelles viennent des dimensions
+FACT_FROM = """
+    FROM fact_sales f
+    JOIN dim_date      d  ON d.date_key     = f.order_date_key
+    JOIN dim_customer  c  ON c.customer_key = f.customer_key
+    JOIN dim_product   p  ON p.product_key  = f.product_key
+    JOIN dim_geography g  ON g.geo_key      = f.geo_key
+    LEFT JOIN dim_ship s   ON s.ship_key    = f.ship_key
+    LEFT JOIN dim_priority pr ON pr.priority_key = f.priority_key
+"""
+# Lignes : toutes les dimensions utiles — date, client/segment, produit (cat, subcat), géographie
+# (country/state/city/region/market/market2), ship (speed_bucket), priority (rank)
+ROWS_SELECT = f"""
+SELECT
+    f.order_id, f.order_line, f.order_date_key, f.ship_date_key,
+    c.customer_id, p.product_id, f.geo_key, s.ship_mode, pr.priority,
+    f.sales, f.quantity, f.discount, f.profit, f.shipping_cost, f.shipping_days,
+    d.date AS order_date,
+    c.customer_name, c.segment,
+    p.category, p.sub_category, p.product_name,
+    g.country, g.state, g.city, g.region, g.market, g.market2,
+    s.speed_bucket,
+    pr.priority_rank
+{FACT_FROM}"""
+ROW_MEASURES = ["sales","profit","discount","quantity","shipping_cost","shipping_days"]
+ROW_TEXT = ["market","market2","region","segment","category","sub_category","ship_mode","priority","speed_bucket"]
+
+# Cube d'agrégats (matérialisé par l'ETL) : grain mois x dimensions filtrables, mesures additives
+CUBE_SELECT = "SELECT * FROM agg_sales_cube"
+CUBE_DIMS = ["yyyymm","market","region","segment","category","sub_category","ship_mode","speed_bucket","priority"]
+CUBE_MEASURES = ["sales","profit","quantity","shipping_days_sum","shipping_days_n","n_rows"]
+
+def typed(df: pd.DataFrame, measures: list, text_cols: list) -> pd.DataFrame:
+    # typage sécurisé (dates, mesures numériques) + nettoyage léger des libellés
+    if "order_date" in df.columns:
+        df["order_date"] = pd.to_datetime(df["order_date"], errors="coerce")
+    for col in measures:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    for col in text_cols:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
+    return df
+
+def current_version(root: str):
+    try:
+        with open(os.path.join(root, CURRENT)) as fh:
+            return fh.read().strip() or None
+    except OSError:
+        return None
+
+def read_store(path: str):
+    # -> (DataFrame, {dimension: {valeur: bitmap}}) ; colonnes numériques sans nulls et chaînes (dtype str
+    # adossé à Arrow) restent des vues sur le fichier mappé ; bitmaps lus sans copie
+    table = pa.ipc.open_file(pa.memory_map(f"{path}.arrow", "r")).read_all()
+    frame = table.to_pandas(split_blocks=True)
+    index = pa.ipc.open_file(pa.memory_map(f"{path}.index.arrow", "r")).read_all()
+    bitmaps = {}
+    for dim, value, bits in zip(index["dim"].to_pylist(), index["value"].to_pylist(), index["bits"]):
+        bitmaps.setdefault(dim, {})[value] = np.frombuffer(bits.as_buffer(), dtype=np.uint8)
+    return frame, bitmaps
+
+class SnapshotWatcher:
+    # Vérifie CURRENT au plus toutes les `interval` secondes ; poll(load) appelle load(dossier de version)
+    # quand une nouvelle version est publiée et renvoie son résultat (None sinon). Un seul thread charge
+    # à la fois : les autres continuent avec la version en place.
+    def __init__(self, root: str, interval: float = 5.0):
+        self.root = root
+        self.interval = interval
+        self.version = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def poll(self, load):
+        if not self.root or time.monotonic() - self._checked < self.interval:
+            return None
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            self._checked = time.monotonic()
+            version = current_version(self.root)
+            if version is None or version == self.version:
+                return None
+            loaded = load(os.path.join(self.root, version))
+            self.version = version
+            print(f"Jeu du dashboard : version {version}")
+            return loaded
+        finally:
+            self._lock.release()
@@ -1,27 +1,104 @@
-import  re
+import csv
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob, escape as glob_escape
+from itertools import islice
 import pandas as pd
-from .config import DATA_PATH,  ENCODING, DECIMAL, SEP
+import pyarrow as pa
+from .config import (DATA_PATH, ENCODING, DECIMAL, SEP, PARSER, CHUNK_SIZE, INGEST_WORKERS, SNAPSHOT_DIR,
+                     SNAPSHOT_KEEP)
 
-def read_orders() -> pd.DataFrame:
-    sep_arg = None if (str(SEP).lower() == "auto") else SEP
-    df = pd.read_csv(DATA_PATH, sep=sep_arg, engine="python", encoding=ENCODING, decimal=DECIMAL)
+DATE_COLS = ["order_date","ship_date"]
+NUM_COLS = ["sales","profit","discount","quantity","shipping_cost"]
+STR_COLS = ["product_id","customer_id","country","state","city","region","market","market2",
+            "product_name","category","sub_category","ship_mode","order_priority"]
 
-    # normalisation colonnes : tout sauf [a-z0-9] => "_"
-    df.columns = [re.sub(r"[^0-9a-zA-Z]+", "_", c).strip("_").lower() for c in df.columns]
+# typage explicite (clé = nom normalisé) : le parseur C n'infère plus rien sur ces colonnes.
+# Les mesures (NUM_COLS) restent inférées par le parseur puis converties par clean_orders : une cellule
+# invalide ("12,5O") devient NaN (et part en quarantaine) au lieu d'arrêter la lecture.
+DTYPES = {c: str for c in DATE_COLS + STR_COLS + ["order_id","customer_name","segment","postal_code"]}
+
+SOURCE_EXTS = (".csv", ".txt", ".xlsx")
+
+def normalize_column(c: str) -> str:
+    # tout sauf [a-z0-9] => "_"
+    return re.sub(r"[^0-9a-zA-Z]+", "_", c).strip("_").lower()
+
+def source_files(path: str = DATA_PATH) -> list:
+    # DATA_PATH : un fichier, un dossier (fichiers .csv / .txt / .xlsx) ou un motif glob ; ordre trié (stable)
+    if os.path.isdir(path):
+        files = [os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(SOURCE_EXTS)]
+    elif any(ch in path for ch in "*?["):
+        files = [f for f in glob(path) if os.path.isfile(f)]
+    else:
+        return [path]
+    if not files:
+        raise FileNotFoundError(f"aucun fichier source pour {path!r}")
+    return sorted(files)
+
+def fingerprint(path: str = DATA_PATH, block: int = 1 << 20) -> str:
+    # empreinte du contenu du fichier source (détection de changement)
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def detect_sep(path: str = DATA_PATH, sample_lines: int = 50) -> str:
+    if str(SEP).lower() != "auto":
+        return SEP
+    # détection unique sur un échantillon (au lieu du sniffing du moteur python)
+    with open(path, encoding=ENCODING, errors="replace", newline="") as fh:
+        sample = "".join(islice(fh, sample_lines))
+    try:
+        return csv.Sniffer().sniff(sample, delimiters="\t,;|").delimiter
+    except csv.Error:
+        return ","
+
+def _dtypes(header) -> dict:
+    return {c: DTYPES[normalize_column(c)] for c in header if normalize_column(c) in DTYPES}
+
+def _csv_options(path: str) -> dict:
+    sep = detect_sep(path)
+    header = pd.read_csv(path, sep=sep, nrows=0, encoding=ENCODING).columns
+    return dict(sep=sep, encoding=ENCODING, decimal=DECIMAL, dtype=_dtypes(header))
+
+def _parse_file(path: str) -> pd.DataFrame:
+    # un fichier complet -> commandes nettoyées ; schéma normalisé fichier par fichier
+    if path.lower().endswith(".xlsx"):
+        header = pd.read_excel(path, nrows=0).columns
+        return clean_orders(pd.read_excel(path, dtype=_dtypes(header)))
+    return clean_orders(pd.read_csv(path, engine=PARSER, **_csv_options(path)))
+
+def _to_number(s: pd.Series) -> pd.Series:
+    # colonne restée texte (cellule invalide dans le lot, ou Excel) : séparateur décimal DECIMAL accepté
+    if not pd.api.types.is_numeric_dtype(s):
+        s = s.astype(str).str.strip()
+        if DECIMAL != ".":
+            s = s.str.replace(DECIMAL, ".", regex=False)
+    return pd.to_numeric(s, errors="coerce")
+
+def clean_orders(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [normalize_column(c) for c in df.columns]
 
     # cast dates
-    for c in ["order_date","ship_date"]:
+    for c in DATE_COLS:
         if c in df.columns:
             df[c] = pd.to_datetime(df[c], errors="coerce")
 
-    # cast numériques
-    for c in ["sales","profit","discount","quantity","shipping_cost"]:
+    # cast numériques (types fixes d'un lot à l'autre ; quantité non entière => NaN)
+    for c in NUM_COLS:
         if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
+            df[c] = _to_number(df[c]).astype("float64")
+    if "quantity" in df.columns:
+        q = df["quantity"]
+        df["quantity"] = q.where(q == q.round()).astype("Int64")
 
     # strings utiles
-    for c in ["product_id","customer_id","country","state","city","region","market","market2",
-              "product_name","category","sub_category","ship_mode","order_priority"]:
+    for c in STR_COLS:
         if c in df.columns:
             df[c] = df[c].astype(str).str.strip()
 
@@ -34,3 +111,199 @@ def read_orders() -> pd.DataFrame:
         df["discount"] = df["discount"] / 100.0
 
     return df
+
+# -------------------- Snapshot typé (Arrow IPC) --------------------
+SNAPSHOT_VERSION = 2  # à incrémenter quand clean_orders / DTYPES changent
+
+def _write_json(path: str, obj):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(obj, fh)
+    os.replace(tmp, path)
+
+def _load_index() -> dict:
+    if not SNAPSHOT_DIR:
+        return {}
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, "index.json")) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+def _indexed_hash(index: dict, path: str):
+    # empreinte connue si la taille et le mtime du fichier n'ont pas changé, sinon None
+    st, entry = os.stat(path), index.get(os.path.abspath(path))
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry["sha256"]
+    return None
+
+def _save_hashes(hashes: dict):
+    # index mis à jour par le seul processus principal (les workers renvoient leurs empreintes)
+    if not SNAPSHOT_DIR or not hashes:
+        return
+    index = _load_index()
+    for path, sha in hashes.items():
+        st = os.stat(path)
+        index[os.path.abspath(path)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+    _write_json(os.path.join(SNAPSHOT_DIR, "index.json"), index)
+
+def source_hash(path: str = DATA_PATH) -> str:
+    # empreinte du contenu, recalculée seulement si la taille ou le mtime du fichier ont changé
+    sha = _indexed_hash(_load_index(), path)
+    if sha is None:
+        sha = fingerprint(path)
+        _save_hashes({path: sha})
+    return sha
+
+def sources_fingerprint(path: str = DATA_PATH) -> str:
+    # empreinte de l'ensemble des sources (un seul fichier : son empreinte, identique à fingerprint()) ;
+    # empreintes par fichier relues de l'index des snapshots si la taille et le mtime n'ont pas changé
+    files = source_files(path)
+    hashes = [source_hash(f) if SNAPSHOT_DIR else fingerprint(f) for f in files]
+    if len(files) == 1:
+        return hashes[0]
+    h = hashlib.sha256()
+    for f, sha in zip(files, hashes):
+        h.update(f"{os.path.relpath(f)}\t{sha}\n".encode())
+    return h.hexdigest()
+
+def _snapshot_prefix(path: str) -> str:
+    # nom du fichier + empreinte du chemin : deux sources de même nom dans des dossiers différents ne se mélangent pas
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]}"
+
+def snapshot_path(path: str = DATA_PATH, chunksize: int = 0, sha: str = None) -> str:
+    # clé = contenu + réglages de lecture (+ taille de lot : la conversion discount % est décidée par lot)
+    key = "|".join(map(str, [sha or source_hash(path), ENCODING, DECIMAL, SEP, chunksize, SNAPSHOT_VERSION]))
+    return os.path.join(SNAPSHOT_DIR, f"{_snapshot_prefix(path)}-{hashlib.sha256(key.encode()).hexdigest()[:16]}.arrow")
+
+def evict_snapshots(path: str, keep: int = SNAPSHOT_KEEP):
+    # les `keep` snapshots les plus récents sont gardés pour chaque fichier source
+    snaps = sorted(glob(os.path.join(SNAPSHOT_DIR, f"{glob_escape(_snapshot_prefix(path))}-*.arrow")),
+                   key=os.path.getmtime, reverse=True)
+    for old in snaps[max(keep, 1):]:
+        os.remove(old)
+
+def _read_snapshot(snap: str, chunksize: int):
+    # colonnes relues par memory-map, sans parsing ; index identique à la lecture CSV
+    os.utime(snap)
+    table = pa.ipc.open_file(pa.memory_map(snap, "r")).read_all()
+    if not chunksize:
+        yield table.to_pandas()
+        return
+    for start in range(0, table.num_rows, chunksize):
+        df = table.slice(start, chunksize).to_pandas()
+        df.index = pd.RangeIndex(start, start + len(df))
+        yield df
+
+def _write_snapshot(snap: str, frames, source: str):
+    # écriture lot par lot au fil de la lecture, publiée par os.replace une fois complète
+    tmp, writer, schema = f"{snap}.{os.getpid()}.tmp", None, None
+    try:
+        for df in frames:
+            # schéma du 1er lot imposé aux suivants (une colonne vide dans un lot n'en change pas le type)
+            table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pa.ipc.new_file(tmp, schema)
+            writer.write_table(table)
+            yield df
+        if writer is not None:
+            writer.close()
+            os.replace(tmp, snap)
+            evict_snapshots(source)
+    finally:
+        if writer is not None and os.path.exists(tmp):
+            writer.close()
+            os.remove(tmp)
+
+def _cached(path: str, chunksize: int, parse):
+    if not SNAPSHOT_DIR:
+        return parse()
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    snap = snapshot_path(path, chunksize)
+    if os.path.exists(snap):
+        return _read_snapshot(snap, chunksize)
+    return _write_snapshot(snap, parse(), path)
+
+# -------------------- Sources multiples (dossier / glob) --------------------
+def _ingest(path: str, sha: str = None):
+    # exécuté dans un processus du pool : parsing + snapshot du fichier
+    # -> (empreinte, chemin du snapshot) ou, sans SNAPSHOT_DIR, (empreinte, table Arrow)
+    if not SNAPSHOT_DIR:
+        return sha, pa.Table.from_pandas(_parse_file(path), preserve_index=False)
+    sha = sha or fingerprint(path)
+    snap = snapshot_path(path, 0, sha)
+    if not os.path.exists(snap):
+        for _ in _write_snapshot(snap, [_parse_file(path)], path):
+            pass
+    return sha, snap
+
+def ingest(files: list, workers: int = INGEST_WORKERS) -> list:
+    # un fichier par tâche sur un pool de processus (le parsing n'est plus borné à un cœur) ;
+    # un fichier déjà ingéré (même empreinte, snapshot présent) n'est pas reparsé
+    index = _load_index()
+    known = {f: _indexed_hash(index, f) for f in files}
+    out = {}
+    if SNAPSHOT_DIR:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        for f, sha in known.items():
+            if sha and os.path.exists(snapshot_path(f, 0, sha)):
+                out[f] = snapshot_path(f, 0, sha)
+    todo = [f for f in files if f not in out]
+    if len(todo) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            done = list(pool.map(_ingest, todo, [known[f] for f in todo]))
+    else:
+        done = [_ingest(f, known[f]) for f in todo]
+    _save_hashes({f: sha for f, (sha, _) in zip(todo, done) if sha != known[f]})
+    out.update({f: result for f, (_, result) in zip(todo, done)})
+    print(f"Sources : {len(files)} fichier(s), {len(todo)} parsé(s), {len(files) - len(todo)} déjà ingéré(s)")
+    return [out[f] for f in files]
+
+def _as_table(item) -> pa.Table:
+    if isinstance(item, pa.Table):
+        return item
+    os.utime(item)
+    return pa.ipc.open_file(pa.memory_map(item, "r")).read_all()
+
+def read_files(files: list, workers: int = INGEST_WORKERS) -> pd.DataFrame:
+    # concaténation Arrow sans copie (snapshots mappés en mémoire, colonnes absentes d'un fichier => nulles),
+    # puis une seule conversion vers pandas
+    tables = [_as_table(t) for t in ingest(files, workers)]
+    table = pa.concat_tables(tables, promote_options="permissive") if len(tables) > 1 else tables[0]
+    return table.to_pandas()
+
+def read_orders(path: str = DATA_PATH) -> pd.DataFrame:
+    files = source_files(path)
+    if len(files) > 1:
+        return read_files(files)
+    path = files[0]
+    (df,) = _cached(path, 0, lambda: [_parse_file(path)])  # consommé jusqu'au bout : le snapshot est publié
+    return df
+
+def _parse_batches(path: str, chunksize: int):
+    if path.lower().endswith(".xlsx"):
+        # pas de lecture par morceaux pour Excel : fichier complet, redécoupé en lots
+        df = _parse_file(path)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+        return
+    with pd.read_csv(path, engine="c", chunksize=chunksize, **_csv_options(path)) as reader:
+        for batch in reader:
+            yield clean_orders(batch)
+
+def iter_orders(path: str = DATA_PATH, chunksize: int = CHUNK_SIZE):
+    # lecture en flux : lots typés/normalisés de `chunksize` lignes, mémoire bornée
+    # (le moteur pyarrow ne sait pas lire par morceaux => toujours le parseur C ici)
+    # NB : la conversion discount % est décidée lot par lot (par fichier pour des sources multiples)
+    files = source_files(path)
+    if len(files) == 1:
+        yield from _cached(files[0], chunksize, lambda: _parse_batches(files[0], chunksize))
+    elif SNAPSHOT_DIR:
+        # fichiers snapshotés en parallèle, puis relus lot par lot par memory-map
+        for snap in ingest(files):
+            yield from _read_snapshot(snap, chunksize)
+    else:
+        for f in files:
+            yield from _parse_batches(f, chunksize)
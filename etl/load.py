@@ -1,31 +1,429 @@
+import io
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine, text
-from .config import DB_URL
+from .config import DB_URL, LOAD_METHOD, LOAD_WORKERS
+from .transform import SURROGATE_KEYS
 import pandas as pd
 import pathlib
 
+DIM_TABLES = ["dim_date","dim_customer","dim_product","dim_geography","dim_ship","dim_priority"]
+PRIMARY_KEYS = {
+    "dim_date": ["date_key"],
+    "dim_customer": ["customer_key"],
+    "dim_product": ["product_key"],
+    "dim_geography": ["geo_key"],
+    "dim_ship": ["ship_key"],
+    "dim_priority": ["priority_key"],
+    "fact_sales": ["order_id","order_line","order_date_key"],
+}
+COPY_ROWS = 100_000        # lignes sérialisées par morceau
+COPY_READ = 1 << 20        # taille des lectures de COPY
+
 def get_engine():
-    return create_engine(DB_URL, future=True)
+    # une connexion par worker de chargement + une pour l'orchestration
+    return create_engine(DB_URL, future=True, pool_size=LOAD_WORKERS + 1)
+
+def use_copy(engine) -> bool:
+    # COPY FROM STDIN passe par psycopg2 ; to_sql reste le repli pour les autres bases/drivers
+    return (LOAD_METHOD == "copy" and engine.dialect.name == "postgresql"
+            and engine.dialect.driver == "psycopg2")
 
 def create_schema(engine, ddl_path="sql/ddl_star_schema.sql"):
     with engine.begin() as conn:
         sql = pathlib.Path(ddl_path).read_text(encoding="utf-8")
         conn.execute(text(sql))
 
-def full_refresh_table(df: pd.DataFrame, table: str, engine):
+# Cube : recalculé en SQL depuis fact_sales (tous les mois, ou seulement ceux touchés par un delta)
+CUBE_SELECT = """
+SELECT d.yyyymm, g.market, g.region, c.segment, p.category, p.sub_category,
+       s.ship_mode, s.speed_bucket, pr.priority,
+       SUM(f.sales), SUM(f.profit), SUM(f.quantity),
+       SUM(f.shipping_days), COUNT(f.shipping_days), COUNT(*)
+FROM fact_sales f
+JOIN dim_date      d  ON d.date_key     = f.order_date_key
+JOIN dim_customer  c  ON c.customer_key = f.customer_key
+JOIN dim_product   p  ON p.product_key  = f.product_key
+JOIN dim_geography g  ON g.geo_key      = f.geo_key
+LEFT JOIN dim_ship s   ON s.ship_key    = f.ship_key
+LEFT JOIN dim_priority pr ON pr.priority_key = f.priority_key
+{where}
+GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9
+"""
+
+def refresh_cube(conn, months: list = None) -> dict:
+    # recalcul complet : index retirés pendant l'insertion (triée par mois) et reconstruits en bloc ensuite
+    t0 = time.perf_counter()
+    params = {}
+    if months is None:
+        conn.execute(text("DELETE FROM agg_sales_cube"))
+        drop_indexes(conn, "agg_sales_cube")
+        where = ""
+    else:
+        params["months"] = [int(m) for m in months]
+        conn.execute(text("DELETE FROM agg_sales_cube WHERE yyyymm = ANY(:months)"), params)
+        where = "WHERE d.yyyymm = ANY(:months)"
+    res = conn.execute(text(f"INSERT INTO agg_sales_cube {CUBE_SELECT.format(where=where)} ORDER BY 1"), params)
+    ensure_indexes(conn, "agg_sales_cube")
+    secs = time.perf_counter() - t0
+    return {"table": "agg_sales_cube", "rows": res.rowcount, "seconds": secs,
+            "rows_per_sec": res.rowcount / secs if secs > 0 else 0.0}
+
+def read_key_maps(engine) -> dict:
+    # correspondances clé naturelle -> clé de substitution déjà en base (stabilité entre runs)
+    maps = {}
+    with engine.begin() as conn:
+        for table, (key, natural) in SURROGATE_KEYS.items():
+            maps[table] = pd.read_sql(text(f"SELECT {key}, {', '.join(natural)} FROM {table}"), conn)
+    return maps
+
+def truncate_table(table: str, engine):
     with engine.begin() as conn:
         conn.execute(text(f"TRUNCATE TABLE {table} RESTART IDENTITY CASCADE;"))
-    df.to_sql(table, engine, if_exists="append", index=False, method="multi", chunksize=1000)
 
-def load_all(dim_customer, dim_product, dim_geography, dim_ship, dim_priority, dim_date, fact_sales):
+# -------------------- COPY (format texte) --------------------
+def _copy_text(df: pd.DataFrame) -> str:
+    # sérialisation vectorisée au format texte de COPY : tabulations, \N pour NULL
+    cols = []
+    for c in df.columns:
+        s = df[c]
+        out = s.astype(str)
+        if ((s.dtype == object or pd.api.types.is_string_dtype(s))
+                and out.str.contains(r"[\\\t\n\r]", regex=True).any()):
+            out = (out.str.replace("\\", "\\\\", regex=False)
+                      .str.replace("\t", "\\t", regex=False)
+                      .str.replace("\n", "\\n", regex=False)
+                      .str.replace("\r", "\\r", regex=False))
+        cols.append(out.mask(s.isna(), "\\N"))
+    if not cols or df.empty:
+        return ""
+    lines = cols[0].str.cat(cols[1:], sep="\t") if len(cols) > 1 else cols[0]
+    return "\n".join(lines) + "\n"
+
+class CopyStream:
+    # fichier virtuel lu par COPY : le DataFrame est sérialisé morceau par morceau en mémoire
+    # (pas de fichier temporaire, pas de copie texte complète de la table)
+    def __init__(self, df: pd.DataFrame, rows: int = COPY_ROWS):
+        self._chunks = (_copy_text(df.iloc[i:i + rows]) for i in range(0, len(df), rows))
+        self._cur = io.StringIO()
+
+    def read(self, size: int = -1) -> str:
+        data = self._cur.read(size)
+        while not data:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return ""
+            self._cur = io.StringIO(chunk)
+            data = self._cur.read(size)
+        return data
+
+    readline = read
+
+def copy_into(conn, df: pd.DataFrame, table: str, freeze: bool = False):
+    # conn : connexion SQLAlchemy (la COPY s'exécute dans sa transaction) ;
+    # freeze : table créée dans cette transaction => lignes écrites déjà gelées (pas de réécriture
+    # ultérieure par le VACUUM anti-wraparound)
+    cols = ", ".join(df.columns)
+    cur = conn.connection.cursor()
+    try:
+        cur.copy_expert(f"COPY {table} ({cols}) FROM STDIN" + (" WITH (FREEZE)" if freeze else ""),
+                        CopyStream(df), size=COPY_READ)
+    finally:
+        cur.close()
+
+# -------------------- Partitions mensuelles de fact_sales --------------------
+def partition_name(yyyymm: int) -> str:
+    return f"fact_sales_p{yyyymm}"
+
+def partition_bounds(yyyymm: int):
+    # bornes de order_date_key (AAAAMMJJ) : [AAAAMM00, mois suivant AAAAMM00[
+    year, month = divmod(int(yyyymm), 100)
+    nxt = (year + 1) * 100 + 1 if month == 12 else yyyymm + 1
+    return int(yyyymm) * 100, int(nxt) * 100
+
+def fact_months(fact: pd.DataFrame) -> list:
+    return sorted(int(m) for m in fact["order_date_key"].dropna().floordiv(100).unique())
+
+def dated_facts(fact: pd.DataFrame) -> pd.DataFrame:
+    # la clé de partition (et de la clé primaire) ne peut pas être NULL
+    missing = int(fact["order_date_key"].isna().sum())
+    if missing:
+        print(f"⚠️ {missing} lignes de faits sans order_date ignorées")
+        return fact[fact["order_date_key"].notna()]
+    return fact
+
+def existing_partitions(conn) -> list:
+    rows = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'fact_sales'::regclass
+    """)).scalars()
+    return sorted(rows)
+
+def ensure_partitions(conn, months: list):
+    for m in months:
+        lo, hi = partition_bounds(m)
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {partition_name(m)} "
+                          f"PARTITION OF fact_sales FOR VALUES FROM ({lo}) TO ({hi})"))
+
+def foreign_keys(conn, table: str) -> dict:
+    # nom -> définition ("FOREIGN KEY (...) REFERENCES ...") des clés étrangères déclarées sur `table`
+    return dict(conn.execute(text("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = CAST(:table AS regclass) AND contype = 'f' AND conparentid = 0
+    """), {"table": table}).all())
+
+def stage_partition(conn, df: pd.DataFrame, yyyymm: int) -> str:
+    # mois construit dans une table détachée : chargement (trié par date, pour les index BRIN), puis clé
+    # primaire, index secondaires et clés étrangères construits / validés en bloc, contrainte de bornes
+    # (clés étrangères et bornes déjà vérifiées => l'ATTACH ne reparcourt pas la partition)
+    stage, (lo, hi) = partition_name(yyyymm) + "_stage", partition_bounds(yyyymm)
+    conn.execute(text(f"DROP TABLE IF EXISTS {stage}"))
+    conn.execute(text(f"CREATE TABLE {stage} (LIKE fact_sales INCLUDING DEFAULTS)"))
+    insert_into(conn, df.sort_values("order_date_key", kind="stable"), stage, freeze=True)
+    conn.execute(text(f"ALTER TABLE {stage} ADD CONSTRAINT {stage}_pkey "
+                      f"PRIMARY KEY (order_id, order_line, order_date_key)"))
+    for name, spec in declared_indexes("fact_sales").items():
+        conn.execute(text(f"CREATE INDEX {stage}_{name} ON {stage} {spec}"))
+    for name, spec in foreign_keys(conn, "fact_sales").items():
+        conn.execute(text(f"ALTER TABLE {stage} ADD CONSTRAINT {name} {spec}"))
+    conn.execute(text(f"ALTER TABLE {stage} ADD CONSTRAINT {stage}_bounds "
+                      f"CHECK (order_date_key >= {lo} AND order_date_key < {hi})"))
+    return stage
+
+def attach_partition(conn, yyyymm: int):
+    # échange atomique (dans la transaction de conn) : l'ancien mois disparaît, le nouveau est attaché
+    name, stage, (lo, hi) = partition_name(yyyymm), partition_name(yyyymm) + "_stage", partition_bounds(yyyymm)
+    conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    conn.execute(text(f"ALTER TABLE {stage} RENAME TO {name}"))
+    conn.execute(text(f"ALTER INDEX {stage}_pkey RENAME TO {name}_pkey"))
+    for idx in declared_indexes("fact_sales"):
+        conn.execute(text(f"ALTER INDEX {stage}_{idx} RENAME TO {name}_{idx}"))
+    conn.execute(text(f"ALTER TABLE fact_sales ATTACH PARTITION {name} FOR VALUES FROM ({lo}) TO ({hi})"))
+    conn.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {stage}_bounds"))
+
+def swap_partitions(eng, fact: pd.DataFrame, replace_all: bool = False) -> dict:
+    # chaque mois touché est construit à part (en parallèle, sans verrou sur fact_sales ; dimensions déjà
+    # en base), puis tous sont attachés dans une transaction courte : le verrou exclusif pris par le
+    # DROP / ATTACH ne couvre que les renommages ; replace_all : les mois absents de `fact` sont supprimés
+    # (rechargement complet)
+    t0 = time.perf_counter()
+    fact = dated_facts(fact)
+    months = fact.groupby(fact["order_date_key"] // 100)
+
+    def build(item):
+        m, part = item
+        with eng.begin() as conn:
+            stage_partition(conn, part, int(m))
+        return int(m)
+
+    with ThreadPoolExecutor(max_workers=max(1, LOAD_WORKERS)) as pool:
+        built = list(pool.map(build, months))
+    with eng.begin() as conn:
+        # index du parent absents de sql/indices.sql supprimés avant l'ATTACH (sinon reconstruits ici, en série)
+        drop_indexes(conn, "fact_sales", keep=declared_indexes("fact_sales"))
+        for m in built:
+            attach_partition(conn, m)
+        ensure_indexes(conn, "fact_sales")
+        if replace_all:
+            keep = {partition_name(m) for m in built}
+            for name in existing_partitions(conn):
+                if name not in keep:
+                    conn.execute(text(f"DROP TABLE {name}"))
+    secs = time.perf_counter() - t0
+    return {"table": "fact_sales", "rows": len(fact), "partitions": len(built), "seconds": secs,
+            "rows_per_sec": len(fact) / secs if secs > 0 else 0.0}
+
+# -------------------- Index secondaires (sql/indices.sql) --------------------
+def declared_indexes(table: str, path: str = "sql/indices.sql") -> dict:
+    # nom -> définition ("USING ... (...)" après "ON <table>") des index de `table` déclarés dans sql/indices.sql
+    sql = re.sub(r"--[^\n]*", "", pathlib.Path(path).read_text(encoding="utf-8"))
+    return {name: " ".join(spec.split()) for name, spec in
+            re.findall(rf"CREATE INDEX IF NOT EXISTS (\w+)\s+ON {table}\s+([^;]+);", sql)}
+
+def drop_indexes(conn, table: str, keep=()) -> list:
+    # index secondaires de `table` (d'un parent partitionné : aussi ceux des partitions), sauf `keep` ;
+    # la clé primaire reste
+    names = conn.execute(text("""
+        SELECT c.relname FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = CAST(:table AS regclass) AND NOT i.indisprimary
+    """), {"table": table}).scalars().all()
+    dropped = [n for n in names if n not in keep]
+    for n in dropped:
+        conn.execute(text(f"DROP INDEX {n}"))
+    return dropped
+
+def ensure_indexes(conn, table: str):
+    # index déclarés absents construits ; sur fact_sales, l'index équivalent déjà construit sur chaque
+    # partition est rattaché au parent (pas de reconstruction)
+    for name, spec in declared_indexes(table).items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} {spec}"))
+
+def rebuild_fact_indexes(eng) -> dict:
+    # après un chargement en masse sans index secondaires : index du parent créés ON ONLY (invalides),
+    # index des partitions construits en parallèle (une connexion par construction), rattachés ensemble
+    # (le parent redevient valide), puis VACUUM ANALYZE
+    t0 = time.perf_counter()
+    indexes = declared_indexes("fact_sales")
+    with eng.begin() as conn:
+        parts = existing_partitions(conn)
+        for name, spec in indexes.items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY fact_sales {spec}"))
+    todo = [(part, name) for part in parts for name in indexes]
+
+    def build(item):
+        part, name = item
+        with eng.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {part}_{name} ON {part} {indexes[name]}"))
+
+    with ThreadPoolExecutor(max_workers=max(1, LOAD_WORKERS)) as pool:
+        list(pool.map(build, todo))
+    with eng.begin() as conn:
+        for part, name in todo:
+            conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {part}_{name}"))
+    vacuum_analyze(eng, ["fact_sales"])
+    with eng.connect() as conn:
+        rows = int(conn.execute(text("""
+            SELECT COALESCE(sum(c.reltuples), 0) FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'fact_sales'::regclass
+        """)).scalar())
+    secs = time.perf_counter() - t0
+    return {"table": "fact_indexes", "rows": rows, "indexes": len(todo), "seconds": secs,
+            "rows_per_sec": rows / secs if secs > 0 else 0.0}
+
+def analyze(conn, tables: list):
+    # statistiques à jour après un chargement : le planificateur voit les nouveaux volumes et index
+    conn.execute(text(f"ANALYZE {', '.join(tables)}"))
+
+def vacuum_analyze(eng, tables: list):
+    # hors transaction : statistiques + carte de visibilité complète (COPY FREEZE n'en marque qu'une
+    # partie), condition des parcours d'index seuls
+    with eng.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"VACUUM (ANALYZE) {', '.join(tables)}"))
+
+# -------------------- Chargement --------------------
+def append_table(df: pd.DataFrame, table: str, engine) -> dict:
+    t0 = time.perf_counter()
+    if use_copy(engine):
+        with engine.begin() as conn:
+            copy_into(conn, df, table)
+    else:
+        df.to_sql(table, engine, if_exists="append", index=False, method="multi", chunksize=1000)
+    secs = time.perf_counter() - t0
+    return {"table": table, "rows": len(df), "seconds": secs,
+            "rows_per_sec": len(df) / secs if secs > 0 else 0.0}
+
+def report(stats):
+    for s in stats:
+        merged = f"  ({s['merged']:,} fusionnées)" if "merged" in s else ""
+        print(f"  {s['table']:<14} {s['rows']:>12,} lignes  {s['seconds']:8.2f}s  "
+              f"{s['rows_per_sec']:>12,.0f} lignes/s{merged}")
+
+def load_dims(eng, dim_customer, dim_product, dim_geography, dim_ship, dim_priority, dim_date) -> list:
+    # NB : le TRUNCATE ... CASCADE des dimensions vide aussi fact_sales
+    with eng.begin() as conn:
+        conn.execute(text(f"TRUNCATE TABLE {', '.join(DIM_TABLES)} RESTART IDENTITY CASCADE;"))
+    tables = [(dim_date, "dim_date"), (dim_customer, "dim_customer"), (dim_product, "dim_product"),
+              (dim_geography, "dim_geography"), (dim_ship, "dim_ship")]
+    if not dim_priority.empty:
+        tables.append((dim_priority, "dim_priority"))
+    # dimensions indépendantes => chargées en parallèle sur le pool de connexions
+    with ThreadPoolExecutor(max_workers=max(1, LOAD_WORKERS)) as pool:
+        return list(pool.map(lambda t: append_table(t[0], t[1], eng), tables))
+
+def load_all(dim_customer, dim_product, dim_geography, dim_ship, dim_priority, dim_date, fact_sales) -> list:
     eng = get_engine()
     create_schema(eng)
     # dimensions
-    full_refresh_table(dim_date, "dim_date", eng)
-    full_refresh_table(dim_customer, "dim_customer", eng)
-    full_refresh_table(dim_product, "dim_product", eng)
-    full_refresh_table(dim_geography, "dim_geography", eng)
-    full_refresh_table(dim_ship, "dim_ship", eng)
-    if not dim_priority.empty:
-        full_refresh_table(dim_priority, "dim_priority", eng)
-    # faits
-    full_refresh_table(fact_sales, "fact_sales", eng)
+    stats = load_dims(eng, dim_customer, dim_product, dim_geography, dim_ship, dim_priority, dim_date)
+    # faits : un mois = une partition, construite à part puis attachée
+    stats.append(swap_partitions(eng, fact_sales, replace_all=True))
+    with eng.begin() as conn:
+        stats.append(refresh_cube(conn))
+    vacuum_analyze(eng, DIM_TABLES + ["fact_sales", "agg_sales_cube"])
+    report(stats)
+    return stats
+
+# -------------------- Mode incrémental (upsert) --------------------
+def read_watermark(engine, source: str):
+    # (fingerprint, max_order_date) du dernier chargement de `source`, ou (None, None)
+    with engine.begin() as conn:
+        row = conn.execute(text("SELECT fingerprint, max_order_date FROM etl_watermark WHERE source = :s"),
+                           {"s": source}).first()
+    return (row[0], row[1]) if row else (None, None)
+
+def write_watermark(conn, source: str, fingerprint: str, max_order_date):
+    conn.execute(text("""
+        INSERT INTO etl_watermark (source, fingerprint, max_order_date, loaded_at)
+        VALUES (:s, :fp, :d, now())
+        ON CONFLICT (source) DO UPDATE
+        SET fingerprint = EXCLUDED.fingerprint, max_order_date = EXCLUDED.max_order_date, loaded_at = now()
+    """), {"s": source, "fp": fingerprint, "d": max_order_date})
+
+def save_watermark(engine, source: str, fingerprint: str, max_order_date):
+    with engine.begin() as conn:
+        write_watermark(conn, source, fingerprint, max_order_date)
+
+def insert_into(conn, df: pd.DataFrame, table: str, freeze: bool = False):
+    # insertion dans la transaction de `conn` : COPY si possible, sinon INSERT multi-lignes
+    if use_copy(conn.engine):
+        copy_into(conn, df, table, freeze)
+    elif not df.empty:
+        cols = list(df.columns)
+        rows = df.astype(object).where(df.notna(), None).to_dict("records")
+        conn.execute(text(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)})"),
+                     rows)
+
+def upsert_into(conn, df: pd.DataFrame, table: str) -> tuple:
+    # staging temporaire (même transaction) puis INSERT ... ON CONFLICT sur la clé primaire ;
+    # seules les lignes réellement modifiées sont réécrites -> (lignes fusionnées, dont mises à jour)
+    stage = f"stage_{table}"
+    cols = list(df.columns)
+    keys = PRIMARY_KEYS[table]
+    collist = ", ".join(cols)
+    conn.execute(text(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"))
+    insert_into(conn, df, stage)
+    upd = [c for c in cols if c not in keys]
+    if upd:
+        action = (f"DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in upd)} "
+                  f"WHERE ({', '.join(f'{table}.{c}' for c in upd)}) "
+                  f"IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in upd)})")
+    else:
+        action = "DO NOTHING"
+    # xmax <> 0 : ligne existante mise à jour (0 pour une ligne insérée)
+    updated = conn.execute(text(f"INSERT INTO {table} ({collist}) SELECT {collist} FROM {stage} "
+                                f"ON CONFLICT ({', '.join(keys)}) {action} RETURNING (xmax <> 0)")).scalars().all()
+    return len(updated), sum(updated)
+
+def load_incremental(dim_customer, dim_product, dim_geography, dim_ship, dim_priority, dim_date, fact_sales,
+                     watermark: dict) -> list:
+    # dimensions fusionnées (transaction 1), mois de faits construits en parallèle puis échangés d'un coup
+    # (cf. swap_partitions), cube et statistiques recalculés une fois le verrou de fact_sales relâché ;
+    # watermark écrit en dernier : un run interrompu est simplement rejoué (upsert et échange idempotents)
+    eng = get_engine()
+    create_schema(eng)
+    tables = [(dim_date, "dim_date"), (dim_customer, "dim_customer"), (dim_product, "dim_product"),
+              (dim_geography, "dim_geography"), (dim_ship, "dim_ship"), (dim_priority, "dim_priority")]
+    fact_sales = dated_facts(fact_sales)
+    months = fact_months(fact_sales)
+    stats = []
+    with eng.begin() as conn:
+        for df, table in tables:
+            t0 = time.perf_counter()
+            merged, updated = upsert_into(conn, df, table)
+            secs = time.perf_counter() - t0
+            stats.append({"table": table, "rows": len(df), "merged": merged, "updated": updated, "seconds": secs,
+                          "rows_per_sec": len(df) / secs if secs > 0 else 0.0})
+    # faits : le delta couvre des mois complets, chacun remplace sa partition
+    stats.append(swap_partitions(eng, fact_sales))
+    with eng.begin() as conn:
+        # cube : seuls les mois présents dans le delta sont recalculés
+        stats.append(refresh_cube(conn, months))
+        # seules les partitions remplacées sont réanalysées (carte de visibilité : autovacuum)
+        analyze(conn, [t for _, t in tables] + [partition_name(m) for m in months] + ["agg_sales_cube"])
+        write_watermark(conn, **watermark)
+    report(stats)
+    return stats
@@ -0,0 +1,150 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from .config import METRICS_DIR, PROFILE
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LOG_FILE = "etl_metrics.jsonl"   # un événement JSON par ligne (étapes, tables, fin de run)
+PROM_FILE = "etl.prom"           # fichier texte pour le textfile collector de node_exporter
+
+def peak_rss_mb():
+    # pic de mémoire résidente du processus (ru_maxrss : Ko sous Linux, octets sous macOS)
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+def _rate(rows, secs):
+    return rows / secs if rows is not None and secs > 0 else None
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Run:
+    # Mesures d'un run ETL : une étape = un span (durée, lignes, lignes/s, pic RSS), plus les stats
+    # de chargement par table. Événements écrits au fil de l'eau en JSON ; le fichier Prometheus
+    # est réécrit (atomiquement) en fin de run. PROFILE="cprofile" | "tracemalloc" active un profilage.
+    def __init__(self, mode: str, out_dir: str = METRICS_DIR, profile: str = PROFILE):
+        self.mode = mode
+        self.out_dir = out_dir
+        self.profile = (profile or "").lower()
+        self.started = datetime.now(timezone.utc)
+        self.spans, self.tables = [], []
+        self.quality = None
+        self._t0 = None
+        self._profiler = None
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        if self.profile == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == "tracemalloc":
+            tracemalloc.start()
+        self.log("start")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        secs = time.perf_counter() - self._t0
+        if self._profiler is not None:
+            self._profiler.disable()
+            if self.out_dir:
+                path = os.path.join(self.out_dir, f"etl_{self.started:%Y%m%dT%H%M%S}.pstats")
+                self._profiler.dump_stats(path)
+                print(f"Profil cProfile : {path}")
+        if self.profile == "tracemalloc" and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.success = exc_type is None
+        self.seconds = secs
+        self.log("end", success=self.success, seconds=round(secs, 4), peak_rss_mb=peak_rss_mb(),
+                 error=None if exc is None else f"{exc_type.__name__}: {exc}")
+        self.write_prometheus()
+        return False
+
+    @contextmanager
+    def span(self, stage: str, rows: int = None):
+        # rec["rows"] peut être renseigné dans le bloc, une fois le volume connu
+        rec = {"stage": stage, "rows": rows}
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            secs = time.perf_counter() - t0
+            rec.update(seconds=round(secs, 4), rows_per_sec=_rate(rec["rows"], secs), peak_rss_mb=peak_rss_mb())
+            if tracemalloc.is_tracing():
+                rec["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+            self.spans.append(rec)
+            self.log("span", **rec)
+
+    def record_tables(self, stats: list):
+        # stats : dicts renvoyés par etl.load (table, rows, seconds, rows_per_sec, merged / partitions)
+        for s in stats:
+            self.tables.append(s)
+            self.log("table", **s)
+
+    def record_quality(self, summary: dict):
+        # summary : etl.quality.Validator.summary() (lignes, rejets, échecs par règle)
+        self.quality = summary
+        self.log("quality", **summary)
+
+    def log(self, event: str, **fields):
+        if not self.out_dir:
+            return
+        line = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "event": event,
+                "mode": self.mode, "run_started": self.started.isoformat(timespec="seconds"), **fields}
+        with open(os.path.join(self.out_dir, LOG_FILE), "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(line, default=str) + "\n")
+
+    def prometheus(self) -> str:
+        mode = f'mode="{_label(self.mode)}"'
+        out = []
+
+        def gauge(name, help_, samples):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} gauge")
+            out.extend(f"{name}{{{labels}}} {value}" for labels, value in samples if value is not None)
+
+        gauge("etl_last_run_timestamp_seconds", "Début du dernier run ETL.",
+              [(mode, self.started.timestamp())])
+        gauge("etl_last_run_success", "1 si le dernier run ETL a réussi.", [(mode, int(self.success))])
+        gauge("etl_run_duration_seconds", "Durée totale du dernier run ETL.", [(mode, self.seconds)])
+        gauge("etl_peak_rss_bytes", "Pic de mémoire résidente du dernier run ETL.",
+              [(mode, None if peak_rss_mb() is None else int(peak_rss_mb() * 2**20))])
+        stages = [(f'{mode},stage="{_label(s["stage"])}"', s) for s in self.spans]
+        gauge("etl_stage_duration_seconds", "Durée par étape.", [(l, s["seconds"]) for l, s in stages])
+        gauge("etl_stage_rows", "Lignes traitées par étape.", [(l, s["rows"]) for l, s in stages])
+        gauge("etl_stage_rows_per_second", "Débit par étape.", [(l, s["rows_per_sec"]) for l, s in stages])
+        tables = [(f'{mode},table="{_label(t["table"])}"', t) for t in self.tables]
+        gauge("etl_table_load_duration_seconds", "Durée de chargement par table.",
+              [(l, t["seconds"]) for l, t in tables])
+        gauge("etl_table_rows", "Lignes chargées par table.", [(l, t["rows"]) for l, t in tables])
+        gauge("etl_table_rows_per_second", "Débit de chargement par table.",
+              [(l, t["rows_per_sec"]) for l, t in tables])
+        if self.quality:
+            gauge("etl_rows_quarantined", "Lignes mises en quarantaine par les règles qualité.",
+                  [(mode, self.quality["quarantined"])])
+            gauge("etl_quality_failed_rows", "Lignes en échec par règle qualité.",
+                  [(f'{mode},rule="{_label(code)}"', n) for code, n in self.quality["failed"].items()])
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self):
+        if not self.out_dir:
+            return
+        # écriture atomique : le collector ne lit jamais un fichier à moitié écrit
+        path = os.path.join(self.out_dir, PROM_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as fh:
+            fh.write(self.prometheus())
+        os.replace(f"{path}.tmp", path)
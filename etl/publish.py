@@ -0,0 +1,172 @@
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import text
+from .config import DASH_SNAPSHOT_DIR, DASH_SNAPSHOT_KEEP
+
+# Publication du jeu du dashboard : lignes jointes + cube en Arrow IPC, triés par date, avec les bitmaps
+# des dimensions filtrables déjà calculés. Chaque run écrit une version (dossier v<date>) puis bascule
+# le pointeur CURRENT ; les workers du dashboard la mappent en lecture seule (pages partagées par l'OS).
+READ_ROWS = 1 << 18   # lignes lues par lot (multiple de 8 : les bitmaps des lots se concatènent octet par octet)
+
+# dimensions filtrables, pointeur CURRENT, requêtes et typage : définis une seule fois avec le lecteur
+# (analytics/dash_app/snapshot.py, importé à plat comme par le dashboard)
+DASH_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analytics", "dash_app")
+if DASH_DIR not in sys.path:
+    sys.path.append(DASH_DIR)
+from snapshot import (CURRENT, FILTER_DIMS, ROWS_SELECT, ROW_MEASURES, ROW_TEXT, CUBE_SELECT,
+                      CUBE_DIMS, CUBE_MEASURES, current_version, typed)
+
+ROWS_QUERY = ROWS_SELECT + "{where}\nORDER BY d.date\n"   # triées par date
+CUBE_QUERY = CUBE_SELECT + " {where} ORDER BY yyyymm"
+
+class _Bitmaps:
+    # bitmaps (np.packbits) par valeur de dimension, construits lot par lot : une valeur vue pour la
+    # première fois est complétée par des zéros pour les lots précédents
+    def __init__(self, dims: list):
+        self.dims = dims
+        self.parts = {col: {} for col in dims}
+        self.nbytes = 0
+
+    def add(self, df: pd.DataFrame):
+        size = (len(df) + 7) // 8
+        for col in self.dims:
+            codes, uniques = pd.factorize(df[col])
+            parts = self.parts[col]
+            for i, v in enumerate(uniques):
+                parts.setdefault(v, [np.zeros(self.nbytes, dtype=np.uint8)]).append(np.packbits(codes == i))
+            for v, p in parts.items():
+                if sum(map(len, p)) < self.nbytes + size:
+                    p.append(np.zeros(size, dtype=np.uint8))
+        self.nbytes += size
+
+    def table(self) -> pa.Table:
+        dims, values, bits = [], [], []
+        for col in self.dims:
+            for v, p in self.parts[col].items():
+                dims.append(col)
+                values.append(v)
+                bits.append(np.concatenate(p).tobytes())
+        return pa.table({"dim": pa.array(dims, pa.string()), "value": pa.array(values, pa.string()),
+                         "bits": pa.array(bits, pa.large_binary())})
+
+def _db_tables(conn, query: str, params: dict, measures: list, text_cols: list, schema: pa.Schema = None):
+    # -> (table Arrow, DataFrame) par lot de READ_ROWS lignes ; schéma du 1er lot (ou `schema`) imposé aux suivants
+    for df in pd.read_sql(text(query), conn, params=params, chunksize=READ_ROWS):
+        df = typed(df, measures, text_cols)
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        schema = table.schema
+        yield table, df
+
+def _month_keys(table: pa.Table, key: str) -> np.ndarray:
+    # yyyymm de chaque ligne (colonne yyyymm du cube, ou order_date des lignes)
+    if key == "yyyymm":
+        return table["yyyymm"].to_numpy()
+    m = table[key].to_numpy().astype("datetime64[M]").astype(np.int64)
+    return (m // 12 + 1970) * 100 + m % 12 + 1
+
+def _merged_tables(conn, query: str, prev_path: str, key: str, months: list, measures: list, text_cols: list):
+    # version courante (mappée) dont les mois `months` sont remplacés par leur relecture en base ;
+    # les deux suites sont triées par date : segments inchangés et mois relus entrelacés sans tri
+    prev = pa.ipc.open_file(pa.memory_map(f"{prev_path}.arrow", "r")).read_all()
+    new = [t for t, _ in _db_tables(conn, query, {"months": months}, measures, text_cols, prev.schema)]
+    new = pa.concat_tables(new) if new else prev.schema.empty_table()
+    prev_keys, new_keys = _month_keys(prev, key), _month_keys(new, key)
+    pieces, pos = [], 0
+    for m in sorted(months):
+        lo, hi = np.searchsorted(prev_keys, m, "left"), np.searchsorted(prev_keys, m, "right")
+        n_lo, n_hi = np.searchsorted(new_keys, m, "left"), np.searchsorted(new_keys, m, "right")
+        pieces += [prev.slice(pos, lo - pos), new.slice(n_lo, n_hi - n_lo)]
+        pos = hi
+    pieces.append(prev.slice(pos))
+    merged = pa.concat_tables(pieces)
+    # relu par lots de READ_ROWS lignes (alignement des bitmaps)
+    for start in range(0, merged.num_rows, READ_ROWS):
+        table = merged.slice(start, READ_ROWS)
+        yield table, table.select(FILTER_DIMS).to_pandas()
+
+def _write_store(tables, path: str) -> int:
+    # <path>.arrow (lignes) + <path>.index.arrow (bitmaps) ; tables : (table Arrow, DataFrame des filtres)
+    writer, rows = None, 0
+    bitmaps = _Bitmaps(FILTER_DIMS)
+    try:
+        for table, df in tables:
+            if writer is None:
+                writer = pa.ipc.new_file(f"{path}.arrow", table.schema)
+            writer.write_table(table)
+            bitmaps.add(df)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        return 0
+    index = bitmaps.table()
+    with pa.ipc.new_file(f"{path}.index.arrow", index.schema) as fh:
+        fh.write_table(index)
+    return rows
+
+def evict_versions(out_dir: str = DASH_SNAPSHOT_DIR, keep: int = DASH_SNAPSHOT_KEEP):
+    # les `keep` versions les plus récentes sont gardées (jamais la version courante) ; un worker qui
+    # mappe encore une version supprimée garde ses pages jusqu'au rechargement (sauf sous Windows)
+    current = current_version(out_dir)
+    versions = sorted((d for d in os.listdir(out_dir) if d.startswith("v")), reverse=True)
+    for old in versions[max(keep, 1):]:
+        if old != current:
+            shutil.rmtree(os.path.join(out_dir, old), ignore_errors=True)
+
+def publish_dashboard(engine, out_dir: str = DASH_SNAPSHOT_DIR, keep: int = DASH_SNAPSHOT_KEEP,
+                      months: list = None) -> dict:
+    # -> stats (table, rows, seconds, rows_per_sec, version) ; rien n'est publié sans out_dir.
+    # months : mois (yyyymm) rechargés par un run incrémental — seuls ces mois sont relus en base, les
+    # autres sont repris de la version courante ; sans version courante (ou months=None), tout est relu
+    if not out_dir:
+        return None
+    t0 = time.perf_counter()
+    base = current_version(out_dir)
+    base = os.path.join(out_dir, base) if base and months is not None else None
+    if base and not all(os.path.exists(os.path.join(base, f"{n}.arrow")) for n in ["rows", "cube"]):
+        base = None
+    version = f"v{datetime.now():%Y%m%dT%H%M%S%f}"
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = os.path.join(out_dir, f".{version}.{os.getpid()}.tmp")
+    os.makedirs(tmp)
+    try:
+        # une lecture par requête, en flux (curseur côté serveur) : mémoire bornée par un lot
+        with engine.connect().execution_options(stream_results=True) as conn:
+            if base:
+                months = [int(m) for m in months]
+                where = {"rows": "WHERE d.yyyymm = ANY(:months)", "cube": "WHERE yyyymm = ANY(:months)"}
+                rows_in = _merged_tables(conn, ROWS_QUERY.format(where=where["rows"]), os.path.join(base, "rows"),
+                                         "order_date", months, ROW_MEASURES, ROW_TEXT)
+                cube_in = _merged_tables(conn, CUBE_QUERY.format(where=where["cube"]), os.path.join(base, "cube"),
+                                         "yyyymm", months, CUBE_MEASURES, CUBE_DIMS[1:])
+            else:
+                rows_in = _db_tables(conn, ROWS_QUERY.format(where=""), {}, ROW_MEASURES, ROW_TEXT)
+                cube_in = _db_tables(conn, CUBE_QUERY.format(where=""), {}, CUBE_MEASURES, CUBE_DIMS[1:])
+            rows = _write_store(rows_in, os.path.join(tmp, "rows"))
+            if not rows:
+                print("Dashboard : aucune ligne de faits — version courante conservée")
+                return None
+            _write_store(cube_in, os.path.join(tmp, "cube"))
+        # version complète renommée d'un bloc, puis pointeur basculé atomiquement
+        os.replace(tmp, os.path.join(out_dir, version))
+        with open(os.path.join(out_dir, f"{CURRENT}.tmp"), "w") as fh:
+            fh.write(version)
+        os.replace(os.path.join(out_dir, f"{CURRENT}.tmp"), os.path.join(out_dir, CURRENT))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    evict_versions(out_dir, keep)
+    secs = time.perf_counter() - t0
+    reused = f" ({len(months)} mois relus, reste repris de {os.path.basename(base)})" if base else ""
+    print(f"Dashboard : {rows:,} lignes publiées → {os.path.join(out_dir, version)}{reused}")
+    stats = {"table": "dashboard_snapshot", "rows": rows, "seconds": secs,
+             "rows_per_sec": rows / secs if secs > 0 else 0.0, "version": version}
+    if base:
+        stats["months"] = len(months)
+    return stats
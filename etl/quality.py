@@ -0,0 +1,181 @@
+import operator
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import yaml
+from .config import QUALITY_RULES, QUARANTINE_DIR
+
+# Moteur de règles qualité : chaque règle du YAML donne un masque booléen vectorisé, combinés en un
+# code binaire par ligne (bit i = règle i en échec) en une seule évaluation par lot. Les lignes en échec
+# sur une règle "error" partent en quarantaine avec leurs codes ; les autres sont chargées.
+RULE_TYPES = {"not_null", "range", "referential", "unique", "compare"}
+SEVERITIES = {"error", "warn"}
+COMPARE_OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+               "==": operator.eq, "!=": operator.ne}
+# clean_orders passe les colonnes texte par astype(str) : une valeur absente y devient "nan"
+MISSING_TEXT = ["", "nan", "None", "<NA>", "NaT"]
+REASON_COLUMN = "reason_codes"
+
+def load_rules(path: str = QUALITY_RULES) -> list:
+    with open(path, encoding="utf-8") as fh:
+        rules = (yaml.safe_load(fh) or {}).get("rules") or []
+    if len(rules) > 64:
+        raise ValueError("64 règles qualité au plus (un bit par règle)")
+    for r in rules:
+        if r.get("type") not in RULE_TYPES:
+            raise ValueError(f"règle {r.get('code')!r} : type inconnu {r.get('type')!r}")
+        r.setdefault("severity", "error")
+        if r["severity"] not in SEVERITIES:
+            raise ValueError(f"règle {r['code']!r} : severity {r['severity']!r} (error | warn)")
+        if r["type"] == "compare" and r.get("op") not in COMPARE_OPS:
+            raise ValueError(f"règle {r['code']!r} : opérateur {r.get('op')!r}")
+    return rules
+
+def rule_columns(rule: dict) -> list:
+    if rule["type"] == "compare":
+        return [rule["left"], rule["right"]]
+    return list(rule.get("columns") or [rule["column"]])
+
+def _missing(s: pd.Series) -> pd.Series:
+    miss = s.isna()
+    if s.dtype == object or pd.api.types.is_string_dtype(s):
+        miss |= s.isin(MISSING_TEXT)
+    return miss
+
+def _bound(s: pd.Series, value):
+    return pd.Timestamp(value) if pd.api.types.is_datetime64_any_dtype(s) else value
+
+def _flag(mask) -> np.ndarray:
+    # comparaisons sur types nullables : <NA> = pas d'échec
+    return np.asarray(mask.fillna(False) if hasattr(mask, "fillna") else mask, dtype=bool)
+
+class Validator:
+    # Un validateur par passe de lecture : l'unicité est vérifiée entre lots (clés déjà vues gardées
+    # sous forme de hachages 64 bits). sink : QuarantineSink, ou None pour ne rien écrire.
+    def __init__(self, rules: list = None, sink=None):
+        self.rules = load_rules() if rules is None else rules
+        self.sink = sink
+        self.failed = {r["code"]: 0 for r in self.rules}
+        self.rows, self.quarantined = 0, 0
+        self._seen = {r["code"]: [] for r in self.rules if r["type"] == "unique"}
+        self._skipped = set()
+        self._error_bits = np.uint64(sum(1 << i for i, r in enumerate(self.rules) if r["severity"] == "error"))
+
+    def _fails(self, rule: dict, df: pd.DataFrame) -> np.ndarray:
+        kind = rule["type"]
+        if kind == "not_null":
+            return _flag(np.logical_or.reduce([_missing(df[c]).to_numpy() for c in rule_columns(rule)]))
+        if kind == "range":
+            s = df[rule["column"]]
+            fail = np.zeros(len(df), dtype=bool)
+            if rule.get("min") is not None:
+                fail |= _flag(s < _bound(s, rule["min"]))
+            if rule.get("max") is not None:
+                fail |= _flag(s > _bound(s, rule["max"]))
+            return fail
+        if kind == "referential":
+            s = df[rule["column"]]
+            return _flag(~s.isin(rule["values"]) & ~_missing(s))
+        if kind == "unique":
+            # doublons dans le lot (1re occurrence gardée) + clés vues dans les lots précédents.
+            # Une clé avec une valeur absente n'est comparée à rien (comme une contrainte UNIQUE SQL).
+            # Vérification exacte => 8 octets par clé gardés pour tout le run (~400 Mo pour 50 M de lignes),
+            # en suites triées de tailles décroissantes (au plus log2(n) suites) : recherche dichotomique
+            # dans chacune, un lot n'entraîne pas de re-tri de tout l'historique.
+            keys = df[rule_columns(rule)]
+            rows = np.flatnonzero(keys.notna().all(axis=1).to_numpy())
+            h = pd.util.hash_pandas_object(keys.iloc[rows], index=False).to_numpy()
+            runs = self._seen[rule["code"]]
+            dup = pd.Series(h).duplicated().to_numpy(copy=True)
+            order = np.argsort(h)
+            hs = h[order]
+            for seen in runs:
+                pos = np.minimum(np.searchsorted(seen, hs), len(seen) - 1)
+                dup[order] |= seen[pos] == hs
+            if len(hs):
+                runs.append(hs)
+            # suites de tailles voisines fusionnées (deux suites triées : timsort), chaque clé re-triée
+            # O(log n) fois sur le run
+            while len(runs) > 1 and len(runs[-2]) < 2 * len(runs[-1]):
+                last = runs.pop()
+                runs.append(np.sort(np.concatenate([runs.pop(), last]), kind="stable"))
+            fail = np.zeros(len(df), dtype=bool)
+            fail[rows] = dup
+            return fail
+        # compare : une valeur absente d'un côté ou de l'autre n'est pas un échec (cf. not_null)
+        left, right = df[rule["left"]], df[rule["right"]]
+        ok = _flag(COMPARE_OPS[rule["op"]](left, right))
+        return ~ok & left.notna().to_numpy() & right.notna().to_numpy()
+
+    def codes(self, df: pd.DataFrame) -> np.ndarray:
+        # code binaire par ligne : bit i levé si la règle i échoue
+        codes = np.zeros(len(df), dtype=np.uint64)
+        for i, rule in enumerate(self.rules):
+            cols = rule_columns(rule)
+            missing = [c for c in cols if c not in df.columns]
+            if missing:
+                if rule["type"] == "not_null":
+                    raise ValueError(f"{rule['code']} : colonne(s) absente(s) {missing}")
+                if rule["code"] not in self._skipped:
+                    self._skipped.add(rule["code"])
+                    print(f"⚠️ règle {rule['code']} ignorée : colonne(s) absente(s) {missing}")
+                continue
+            fail = self._fails(rule, df)
+            self.failed[rule["code"]] += int(fail.sum())
+            codes |= fail.astype(np.uint64) << np.uint64(i)
+        return codes
+
+    def reasons(self, codes: np.ndarray) -> pd.Series:
+        # "CODE_A;CODE_B" pour chaque code binaire (appelé sur les seules lignes rejetées)
+        out = pd.Series("", index=range(len(codes)), dtype=object)
+        for i, rule in enumerate(self.rules):
+            hit = (codes >> np.uint64(i)) & np.uint64(1) == 1
+            if hit.any():
+                out[hit] = out[hit] + np.where(out[hit] == "", "", ";") + rule["code"]
+        return out
+
+    def split(self, df: pd.DataFrame) -> pd.DataFrame:
+        # -> lignes propres ; les lignes rejetées vont au sink avec leurs codes
+        codes = self.codes(df)
+        bad = (codes & self._error_bits) != 0
+        self.rows += len(df)
+        if not bad.any():
+            return df
+        n_bad = int(bad.sum())
+        self.quarantined += n_bad
+        if self.sink is not None:
+            self.sink.write(df[bad].assign(**{REASON_COLUMN: self.reasons(codes[bad]).to_numpy()}))
+        return df[~bad]
+
+    def summary(self) -> dict:
+        return {"rows": self.rows, "quarantined": self.quarantined,
+                "quarantine_path": getattr(self.sink, "path", None) if self.quarantined else None,
+                "failed": {code: n for code, n in self.failed.items() if n}}
+
+    def report(self):
+        severity = {r["code"]: r["severity"] for r in self.rules}
+        for code, n in self.failed.items():
+            if n:
+                action = "mises en quarantaine" if severity[code] == "error" else "chargées"
+                print(f"⚠️ {code} : {n:,} lignes ({action})")
+        if self.quarantined:
+            where = f" → {self.sink.path}" if self.sink is not None and self.sink.path else ""
+            print(f"⚠️ {self.quarantined:,} / {self.rows:,} lignes en quarantaine{where}")
+
+class QuarantineSink:
+    # lignes rejetées ajoutées lot par lot à un CSV par run (créé au premier rejet)
+    def __init__(self, out_dir: str = QUARANTINE_DIR, stem: str = "orders"):
+        self.out_dir = out_dir
+        self.stem = stem
+        self.path = None
+
+    def write(self, rejected: pd.DataFrame):
+        if not self.out_dir:
+            return
+        if self.path is None:
+            os.makedirs(self.out_dir, exist_ok=True)
+            self.path = os.path.join(self.out_dir, f"{self.stem}_{datetime.now():%Y%m%dT%H%M%S}.csv")
+            rejected.to_csv(self.path, index=False)
+        else:
+            rejected.to_csv(self.path, mode="a", header=False, index=False)
@@ -1,23 +1,175 @@
-from etl.extract import read_orders
-from etl.transform import build_dims, build_fact
-from etl.load import load_all
+import os
+import re
+import pandas as pd
+from etl.config import CHUNK_SIZE, DASH_SNAPSHOT_DIR, DATA_PATH, LOAD_MODE, LOOKBACK_DAYS
+from etl.extract import read_orders, iter_orders, sources_fingerprint
+from etl.transform import build_dims, build_fact, merge_dims, assign_keys, LineCounts
+from etl.load import (load_all, load_dims, load_incremental, get_engine, create_schema, truncate_table,
+                      append_table, ensure_partitions, dated_facts, fact_months, report, read_watermark,
+                      save_watermark, read_key_maps, refresh_cube, drop_indexes, rebuild_fact_indexes,
+                      vacuum_analyze, DIM_TABLES)
+from etl.metrics import Run
+from etl.publish import publish_dashboard, current_version
+from etl.quality import Validator, QuarantineSink
+
+def validator() -> Validator:
+    # règles de QUALITY_RULES ; lignes rejetées dans QUARANTINE_DIR/<source>_<date>.csv
+    # (DATA_PATH peut être un dossier ou un motif glob : nom réduit à [A-Za-z0-9_-])
+    stem = os.path.splitext(os.path.basename(os.path.normpath(DATA_PATH)))[0]
+    return Validator(sink=QuarantineSink(stem=re.sub(r"[^\w-]+", "_", stem).strip("_") or "orders"))
+
+def report_quality(checks: Validator, run: Run):
+    checks.report()
+    run.record_quality(checks.summary())
+
+def publish(eng, run: Run, months: list = None):
+    # nouvelle version du jeu du dashboard (DASH_SNAPSHOT_DIR), reprise à chaud par les workers ;
+    # months : seuls ces mois sont relus en base (incrémental), le reste vient de la version courante
+    if not DASH_SNAPSHOT_DIR:
+        return
+    with run.span("publish") as sp:
+        stats = publish_dashboard(eng, months=months)
+        sp["rows"] = stats["rows"] if stats else 0
+    if stats:
+        run.record_tables([stats])
+
+def _max_date(*dates):
+    known = [pd.Timestamp(d) for d in dates if d is not None and not pd.isna(d)]
+    return max(known).date() if known else None
 
 def main():
-    orders = read_orders()
+    # chaque étape est chronométrée (cf. etl.metrics) : logs JSON + fichier Prometheus dans METRICS_DIR
+    mode = LOAD_MODE if LOAD_MODE == "incremental" else ("batched" if CHUNK_SIZE > 0 else "full")
+    with Run(mode) as run:
+        if mode == "incremental":
+            return main_incremental(run)
+        if mode == "batched":
+            return main_batched(CHUNK_SIZE, run)
+        return main_full(run)
+
+def main_full(run: Run):
+    with run.span("extract") as sp:
+        fp = sources_fingerprint(DATA_PATH)
+        orders = read_orders()
+        sp["rows"] = len(orders)
+
+    # une ligne invalide part en quarantaine au lieu d'interrompre le run
+    checks = validator()
+    with run.span("check", len(orders)):
+        orders = checks.split(orders)
+    report_quality(checks, run)
+
+    eng = get_engine()
+    with run.span("transform", len(orders)):
+        create_schema(eng)
+        dims = assign_keys(build_dims(orders), read_key_maps(eng))
+        dim_customer, dim_product, dim_geography, dim_ship, dim_priority, dim_date = dims
+        fact_sales = build_fact(orders, dims)
+
+    with run.span("load", len(fact_sales)):
+        stats = load_all(dim_customer, dim_product, dim_geography, dim_ship, dim_priority, dim_date, fact_sales)
+        save_watermark(eng, DATA_PATH, fp, _max_date(orders["order_date"].max()))
+    run.record_tables(stats)
+    publish(eng, run)
+    print("ETL terminé ✅")
+
+def main_batched(chunksize: int, run: Run):
+    # Lecture en flux : la mémoire reste bornée par la taille d'un lot, quelle que soit la taille du fichier.
+    # Passe 1 : contrôles + dimensions (petites) fusionnées lot par lot
+    dims, max_date, checks = None, None, validator()
+    with run.span("dims_pass", 0) as sp:
+        fp = sources_fingerprint(DATA_PATH)
+        for batch in iter_orders(chunksize=chunksize):
+            sp["rows"] += len(batch)
+            batch = checks.split(batch)
+            max_date = _max_date(max_date, batch["order_date"].max())
+            part = build_dims(batch)
+            dims = part if dims is None else merge_dims(dims, part)
+    report_quality(checks, run)
+    if dims is None:
+        print("Aucune ligne à charger")
+        return
+
+    eng = get_engine()
+    with run.span("load_dims", sum(len(d) for d in dims)):
+        create_schema(eng)
+        dims = assign_keys(dims, read_key_maps(eng))
+        stats = load_dims(eng, *dims)
+
+    # Passe 2 : faits chargés lot par lot (order_line continu entre lots), sans index secondaires
+    # (reconstruits en bloc à la fin plutôt que maintenus à chaque ligne)
+    with run.span("fact_pass", 0) as sp:
+        truncate_table("fact_sales", eng)
+        with eng.begin() as conn:
+            drop_indexes(conn, "fact_sales")
+        # order_line continu entre lots, même pour une commande dont les lignes ne sont pas contiguës
+        line_counts = LineCounts()
+        fact = {"table": "fact_sales", "rows": 0, "seconds": 0.0}
+        # mêmes règles rejouées (sans réécrire la quarantaine) : mêmes lignes propres qu'en passe 1
+        recheck = Validator(checks.rules)
+        for batch in iter_orders(chunksize=chunksize):
+            batch = recheck.split(batch)
+            part = dated_facts(build_fact(batch, dims, line_counts.advance(batch["order_id"])))
+            with eng.begin() as conn:
+                ensure_partitions(conn, fact_months(part))
+            s = append_table(part, "fact_sales", eng)
+            fact["rows"] += s["rows"]
+            fact["seconds"] += s["seconds"]
+        sp["rows"] = fact["rows"]
+        fact["rows_per_sec"] = fact["rows"] / fact["seconds"] if fact["seconds"] > 0 else 0.0
+    with run.span("indexes") as sp:
+        indexes = rebuild_fact_indexes(eng)
+        sp["rows"] = fact["rows"]
+    with run.span("load_cube") as sp:
+        with eng.begin() as conn:
+            cube = refresh_cube(conn)
+        vacuum_analyze(eng, DIM_TABLES + ["agg_sales_cube"])
+        sp["rows"] = cube["rows"]
+    report(stats + [fact, indexes, cube])
+    run.record_tables(stats + [fact, indexes, cube])
+    save_watermark(eng, DATA_PATH, fp, max_date)
+    publish(eng, run)
+    print("ETL terminé ✅")
+
+def main_incremental(run: Run):
+    # Seul le delta (order_date >= watermark - LOOKBACK_DAYS) est stagé puis fusionné par upsert :
+    # le coût suit la taille du delta, pas l'historique.
+    eng = get_engine()
+    create_schema(eng)
+    fp = sources_fingerprint(DATA_PATH)
+    prev_fp, prev_max = read_watermark(eng, DATA_PATH)
+    if fp == prev_fp:
+        print("Source inchangée — rien à charger ✅")
+        if current_version(DASH_SNAPSHOT_DIR) is None:
+            publish(eng, run)  # 1re publication du jeu du dashboard
+        return
 
-    # Contrôles qualité clés
-    assert not orders["order_id"].isna().any(), "order_id manquant"
-    for c in ["sales","profit","quantity"]:
-        assert c in orders.columns and orders[c].notna().all(), f"valeurs manquantes dans {c}"
-    if "ship_date" in orders.columns and "order_date" in orders.columns:
-        bad_dates = (orders["ship_date"] < orders["order_date"]).sum()
-        if bad_dates > 0:
-            print(f"⚠️ {bad_dates} lignes avec ship_date < order_date")
+    # fact_sales est partitionné par mois : le delta part du 1er du mois pour remplacer des mois complets
+    since = None if prev_max is None else (pd.Timestamp(prev_max) - pd.Timedelta(days=LOOKBACK_DAYS)).replace(day=1)
+    with run.span("extract") as sp:
+        batches = iter_orders(chunksize=CHUNK_SIZE) if CHUNK_SIZE > 0 else [read_orders()]
+        # une commande partage une même order_date : le delta contient toutes ses lignes
+        delta = pd.concat([b if since is None else b[b["order_date"] >= since] for b in batches],
+                          ignore_index=True)
+        sp["rows"] = len(delta)
 
-    dim_customer, dim_product, dim_geography, dim_ship, dim_priority, dim_date = build_dims(orders)
-    fact_sales = build_fact(orders)
+    checks = validator()
+    with run.span("check", len(delta)):
+        delta = checks.split(delta)
+    report_quality(checks, run)
+    print(f"Delta : {len(delta):,} lignes" + (f" depuis {since.date()}" if since is not None else ""))
 
-    load_all(dim_customer, dim_product, dim_geography, dim_ship, dim_priority, dim_date, fact_sales)
+    with run.span("transform", len(delta)):
+        dims = assign_keys(build_dims(delta), read_key_maps(eng))
+        fact_sales = build_fact(delta, dims)
+    watermark = {"source": DATA_PATH, "fingerprint": fp,
+                 "max_order_date": _max_date(prev_max, delta["order_date"].max())}
+    with run.span("load", len(fact_sales)):
+        stats = load_incremental(*dims, fact_sales, watermark=watermark)
+    run.record_tables(stats)
+    # attribut de dimension modifié => les lignes de tous les mois peuvent changer : republication complète
+    updated = sum(s.get("updated", 0) for s in stats)
+    publish(eng, run, months=None if updated else fact_months(fact_sales))
     print("ETL terminé ✅")
 
 if __name__ == "__main__":
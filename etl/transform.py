@@ -1,14 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
+from .config import TRANSFORM_WORKERS
+
+GEO_NATURAL_KEY = ["country","state","city","region"]
+
+# clés de substitution entières : table -> (clé entière, clé naturelle conservée en attribut)
+SURROGATE_KEYS = {
+    "dim_customer": ("customer_key", ["customer_id"]),
+    "dim_product": ("product_key", ["product_id"]),
+    "dim_geography": ("geo_key", GEO_NATURAL_KEY),
+    "dim_ship": ("ship_key", ["ship_mode"]),
+    "dim_priority": ("priority_key", ["priority"]),
+}
+
+def _date_key(dates: pd.Series) -> pd.Series:
+    # AAAAMMJJ calculé sur les datetime64 numpy (sans strftime) ; NaT => <NA>
+    d = pd.to_datetime(dates).to_numpy("datetime64[D]")
+    months = d.astype("datetime64[M]")
+    year = d.astype("datetime64[Y]").astype("int64") + 1970
+    month = months.astype("int64") % 12 + 1
+    day = (d - months).astype("int64") + 1
+    key = pd.array(year * 10000 + month * 100 + day, dtype="Int64")
+    key[np.isnat(d)] = pd.NA
+    return pd.Series(key, index=dates.index)
 
 def build_dim_date(dates: pd.Series) -> pd.DataFrame:
     s = pd.to_datetime(dates.dropna().unique())
     df = pd.DataFrame({"date": s})
-    df["date_key"] = df["date"].dt.strftime("%Y%m%d").astype(int)
     df["year"] = df["date"].dt.year
     df["quarter"] = df["date"].dt.quarter
     df["month"] = df["date"].dt.month
     df["day"] = df["date"].dt.day
+    df["date_key"] = (df["year"] * 10000 + df["month"] * 100 + df["day"]).astype(int)
     df["week"] = df["date"].dt.isocalendar().week.astype(int)
     df["is_weekend"] = df["date"].dt.dayofweek >= 5
     df["yyyymm"] = (df["year"] * 100 + df["month"]).astype(int)
@@ -25,77 +49,196 @@ def _priority_rank(p: str):
     order = {"critical": 1, "high": 2, "medium": 3, "low": 4}
     return order.get((p or "").strip().lower())
 
+def _dedup_customer(df: pd.DataFrame) -> pd.DataFrame:
+    # lignes identiques retirées avant le tri (le tri ne porte plus que sur les valeurs distinctes)
+    return (df.drop_duplicates()
+              .sort_values(["customer_id","segment","customer_name"])
+              .drop_duplicates(subset=["customer_id"], keep="first")
+              .reset_index(drop=True))
+
+def _dedup_product(df: pd.DataFrame) -> pd.DataFrame:
+    return (df.drop_duplicates()
+              .sort_values(["product_id","category","sub_category","product_name"])
+              .drop_duplicates(subset=["product_id"], keep="first")
+              .reset_index(drop=True))
+
+def _strip(df: pd.DataFrame) -> pd.DataFrame:
+    return df.apply(lambda s: s.astype(str).str.strip())
+
+def _columns(df: pd.DataFrame, cols: list) -> pd.DataFrame:
+    # sous-ensemble de colonnes sans copie des données ; colonnes possibles manquantes => vides
+    return pd.DataFrame({c: df[c] if c in df.columns else pd.Series(pd.NA, index=df.index, dtype=object)
+                         for c in cols}, index=df.index)
+
+def _parallel(tasks: list) -> list:
+    # tâches indépendantes (dimensions, recherches de clés) : pandas libère le GIL sur le hachage/tri
+    if TRANSFORM_WORKERS <= 1:
+        return [task() for task in tasks]
+    with ThreadPoolExecutor(max_workers=TRANSFORM_WORKERS) as pool:
+        return [f.result() for f in [pool.submit(task) for task in tasks]]
+
+def _geography(df: pd.DataFrame) -> pd.DataFrame:
+    # dédup sur les valeurs brutes d'abord (même première occurrence), nettoyage sur les seules valeurs distinctes
+    geo = _strip(df.drop_duplicates(subset=GEO_NATURAL_KEY, keep="first"))
+    return geo.drop_duplicates(subset=GEO_NATURAL_KEY, keep="first").reset_index(drop=True)
+
+def _ship(df: pd.DataFrame) -> pd.DataFrame:
+    dim_ship = df.drop_duplicates()
+    return dim_ship.assign(speed_bucket=dim_ship["ship_mode"].map(_bucket_ship))
+
+def _priority(df: pd.DataFrame) -> pd.DataFrame:
+    dp = df.drop_duplicates().rename(columns={"order_priority": "priority"})
+    dp["priority_rank"] = dp["priority"].map(_priority_rank)
+    return dp.drop_duplicates(subset=["priority"]).reset_index(drop=True)
+
+def _dates(df: pd.DataFrame) -> pd.DataFrame:
+    # dates de commande puis d'expédition (ordre d'apparition), une seule construction — unique par date_key
+    dates = pd.concat([pd.Series(df[c].dropna().unique()) for c in ["order_date","ship_date"]])
+    return build_dim_date(dates).drop_duplicates(subset=["date_key"]).reset_index(drop=True)
+
 def build_dims(df_orders: pd.DataFrame):
-    # colonnes possibles manquantes => les créer vides
-    for c in ["product_id","product_name","category","sub_category",
-              "customer_id","customer_name","segment",
-              "country","state","city","region","market","market2",
-              "ship_mode","order_priority"]:
-        if c not in df_orders.columns:
-            df_orders[c] = pd.NA
-
-    # Customer (clé = customer_id)
-    dim_customer = (df_orders[["customer_id","customer_name","segment"]]
-                    .sort_values(["customer_id","segment","customer_name"])
-                    .drop_duplicates(subset=["customer_id"], keep="first")
-                    .reset_index(drop=True))
-
-    # Product (clé = product_id)
-    dim_product = (df_orders[["product_id","product_name","category","sub_category"]]
-                   .sort_values(["product_id","category","sub_category","product_name"])
-                   .drop_duplicates(subset=["product_id"], keep="first")
-                   .reset_index(drop=True))
-
-    # Geography (clé = geo_key)
-    geo = df_orders[["country","state","city","region","market","market2"]].copy()
-    for c in geo.columns:
-        geo[c] = geo[c].astype(str).str.strip()
-    key_parts = [col for col in ["country","state","city","region"] if col in geo.columns]
-    geo["geo_key"] = geo[key_parts].fillna("").astype(str).agg("|".join, axis=1)
-    dim_geography = (geo[["geo_key","country","state","city","region","market","market2"]]
-                     .drop_duplicates(subset=["geo_key"], keep="first")
-                     .reset_index(drop=True))
-
-    # Ship (clé = ship_mode)
-    dim_ship = df_orders[["ship_mode"]].drop_duplicates().copy()
-    dim_ship["speed_bucket"] = dim_ship["ship_mode"].apply(_bucket_ship)
-
-    # Priority (clé = priority)
-    dp = df_orders[["order_priority"]].drop_duplicates().copy()
-    dp["priority"] = dp["order_priority"]
-    dp["priority_rank"] = dp["order_priority"].apply(_priority_rank)
-    dim_priority = dp[["priority","priority_rank"]].drop_duplicates(subset=["priority"]).reset_index(drop=True)
-
-    # Dates (commande + expédition) — unique par date_key
-    dim_date = pd.concat([
-        build_dim_date(df_orders["order_date"]),
-        build_dim_date(df_orders["ship_date"])
-    ]).drop_duplicates(subset=["date_key"]).reset_index(drop=True)
-
-    return dim_customer, dim_product, dim_geography, dim_ship, dim_priority, dim_date
-
-def build_fact(df_orders: pd.DataFrame) -> pd.DataFrame:
-    df = df_orders.copy()
-
-    # sécurité colonnes manquantes
-    for c in ["order_id","order_date","ship_date","customer_id","product_id","ship_mode",
-              "sales","quantity","discount","profit","shipping_cost",
-              "country","state","city","region"]:
-        if c not in df.columns:
-            df[c] = pd.NA
+    df = _columns(df_orders, ["product_id","product_name","category","sub_category",
+                              "customer_id","customer_name","segment",
+                              "country","state","city","region","market","market2",
+                              "ship_mode","order_priority","order_date","ship_date"])
+    return tuple(_parallel([
+        lambda: _dedup_customer(df[["customer_id","customer_name","segment"]]),                   # clé = customer_id
+        lambda: _dedup_product(df[["product_id","product_name","category","sub_category"]]),      # clé = product_id
+        lambda: _geography(df[["country","state","city","region","market","market2"]]),           # country/state/city/region
+        lambda: _ship(df[["ship_mode"]]),                                                        # clé = ship_mode
+        lambda: _priority(df[["order_priority"]]),                                               # clé = priority
+        lambda: _dates(df),                                                                      # commande + expédition
+    ]))
+
+def merge_dims(left, right):
+    # fusion des dimensions de deux lots (lecture par lots) — mêmes règles de dédup que build_dims
+    customer, product, geography, ship, priority, date = (pd.concat([l, r]) for l, r in zip(left, right))
+    return (_dedup_customer(customer),
+            _dedup_product(product),
+            geography.drop_duplicates(subset=GEO_NATURAL_KEY, keep="first").reset_index(drop=True),
+            ship.drop_duplicates(subset=["ship_mode"], keep="first").reset_index(drop=True),
+            priority.drop_duplicates(subset=["priority"], keep="first").reset_index(drop=True),
+            date.drop_duplicates(subset=["date_key"]).reset_index(drop=True))
+
+def _natural_index(df: pd.DataFrame, natural: list) -> pd.Index:
+    if len(natural) == 1:
+        return pd.Index(df[natural[0]])
+    return pd.MultiIndex.from_frame(df[natural])
+
+def _with_surrogate_key(dim: pd.DataFrame, key: str, natural: list, existing: pd.DataFrame = None) -> pd.DataFrame:
+    # correspondance stable d'un run à l'autre : les clés déjà attribuées sont réutilisées,
+    # les nouvelles valeurs naturelles reçoivent max+1, max+2, ...
+    codes = np.full(len(dim), -1, dtype="int64")
+    start = 1
+    if existing is not None and not existing.empty:
+        idx = _natural_index(existing, natural).get_indexer(_natural_index(dim, natural))
+        known = idx >= 0
+        codes[known] = existing[key].to_numpy()[idx[known]]
+        start = int(existing[key].max()) + 1
+    new = codes < 0
+    codes[new] = np.arange(start, start + new.sum())
+    out = dim.copy()
+    out.insert(0, key, codes.astype("int32"))
+    return out
+
+def assign_keys(dims, key_maps: dict = None):
+    # key_maps : table -> DataFrame (clé entière + clé naturelle) déjà en base
+    key_maps = key_maps or {}
+    dim_customer, dim_product, dim_geography, dim_ship, dim_priority, dim_date = dims
+    keyed = [_with_surrogate_key(dim, *SURROGATE_KEYS[table], key_maps.get(table))
+             for table, dim in [("dim_customer", dim_customer), ("dim_product", dim_product),
+                                ("dim_geography", dim_geography), ("dim_ship", dim_ship),
+                                ("dim_priority", dim_priority)]]
+    return (*keyed, dim_date)
+
+def _factorize_rows(values: pd.DataFrame):
+    # code par ligne (ordre de première apparition) + position de la 1re occurrence de chaque combinaison
+    codes, n = np.zeros(len(values), dtype="int64"), 1
+    for c in values.columns:
+        col, uniques = pd.factorize(values[c], use_na_sentinel=False)
+        codes = codes * max(len(uniques), 1) + col
+        if n > 1:
+            codes, uniques = pd.factorize(codes)
+        n = len(uniques)
+    # écriture en ordre inverse : la dernière affectation (= 1re occurrence) l'emporte
+    first = np.empty(n, dtype="int64")
+    first[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+    return codes, first
+
+def _lookup_key(dim: pd.DataFrame, key: str, natural: list, values: pd.DataFrame, clean=None) -> pd.Series:
+    # clé naturelle -> clé entière : recherche par hachage sur les seules combinaisons distinctes
+    codes, first = _factorize_rows(values[natural])
+    distinct = values[natural].iloc[first]
+    if clean is not None:
+        distinct = clean(distinct)
+    idx = _natural_index(dim, natural).get_indexer(_natural_index(distinct, natural))
+    keys = pd.array(dim[key].to_numpy()[idx], dtype="Int32")
+    keys[idx < 0] = pd.NA
+    return pd.Series(keys[codes], index=values.index)
+
+class LineCounts:
+    # lecture par lots : lignes déjà numérotées par commande, cumulées sur tout le run (une commande peut
+    # revenir plusieurs lots plus loin). Hachage 64 bits de order_id -> nb de lignes, soit 16 octets par
+    # commande, en suites triées de tailles décroissantes fusionnées au fil des lots (cf. règle unique de
+    # etl.quality) : un lot n'entraîne pas de re-tri de tout l'historique.
+    def __init__(self):
+        self._runs = []   # (hachages triés et distincts, lignes)
+
+    def advance(self, order_ids: pd.Series) -> pd.Series:
+        # -> lignes déjà vues de chaque commande du lot (index : order_id) ; le lot est ensuite compté
+        counts = order_ids.value_counts()
+        h = pd.util.hash_pandas_object(counts.index.to_series(), index=False).to_numpy()
+        seen = np.zeros(len(h), dtype=np.int64)
+        for keys, lines in self._runs:
+            pos = np.minimum(np.searchsorted(keys, h), len(keys) - 1)
+            seen += np.where(keys[pos] == h, lines[pos], 0)
+        if len(h):
+            order = np.argsort(h)
+            self._runs.append((h[order], counts.to_numpy(dtype=np.int64)[order]))
+        while len(self._runs) > 1 and len(self._runs[-2][0]) < 2 * len(self._runs[-1][0]):
+            (k2, n2), (k1, n1) = self._runs.pop(), self._runs.pop()
+            keys, lines = np.concatenate([k1, k2]), np.concatenate([n1, n2])
+            order = np.argsort(keys, kind="stable")
+            keys, lines = keys[order], lines[order]
+            first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            self._runs.append((keys[first], np.add.reduceat(lines, first)))
+        return pd.Series(seen, index=counts.index)
+
+def build_fact(df_orders: pd.DataFrame, dims, line_offsets: pd.Series = None) -> pd.DataFrame:
+    # dims : sortie de assign_keys (dimensions avec clés de substitution)
+    # sécurité colonnes manquantes (sans copier df_orders)
+    df = _columns(df_orders, ["order_id","order_date","ship_date","customer_id","product_id","ship_mode",
+                              "sales","quantity","discount","profit","shipping_cost",
+                              "country","state","city","region"])
 
     # dérivés
-    df["order_line"] = df.groupby("order_id").cumcount() + 1
-    df["order_date_key"] = pd.to_datetime(df["order_date"]).dt.strftime("%Y%m%d").astype("Int64")
-    df["ship_date_key"]  = pd.to_datetime(df["ship_date"]).dt.strftime("%Y%m%d").astype("Int64")
-    df["shipping_days"]  = (pd.to_datetime(df["ship_date"]) - pd.to_datetime(df["order_date"])).dt.days
-
-    df["geo_key"] = (df["country"].fillna("") + "|" + df["state"].fillna("") + "|" +
-                     df["city"].fillna("") + "|" + df["region"].fillna(""))
-
-    cols = ["order_id","order_line","order_date_key","ship_date_key","customer_id","product_id",
-            "geo_key","ship_mode","sales","quantity","discount","profit","shipping_cost","shipping_days"]
-    if "order_priority" in df.columns:
-        cols.append("order_priority")
-    fact = df[cols].rename(columns={"order_priority":"priority"})
+    order_line = df.groupby("order_id").cumcount() + 1
+    if line_offsets is not None and not line_offsets.empty:
+        # lecture par lots : lignes de la commande déjà chargées avec les lots précédents (cf. LineCounts)
+        order_line += df["order_id"].map(line_offsets).fillna(0).astype(int)
+    order_date, ship_date = pd.to_datetime(df["order_date"]), pd.to_datetime(df["ship_date"])
+
+    # clés de substitution (jointures entières), recherches indépendantes en parallèle
+    dim_customer, dim_product, dim_geography, dim_ship, dim_priority, _ = dims
+    with_priority = "order_priority" in df_orders.columns and not dim_priority.empty
+    tasks = [
+        lambda: _lookup_key(dim_customer, *SURROGATE_KEYS["dim_customer"], df),
+        lambda: _lookup_key(dim_product, *SURROGATE_KEYS["dim_product"], df),
+        lambda: _lookup_key(dim_geography, *SURROGATE_KEYS["dim_geography"], df, clean=_strip),
+        lambda: _lookup_key(dim_ship, *SURROGATE_KEYS["dim_ship"], df),
+    ]
+    if with_priority:
+        tasks.append(lambda: _lookup_key(dim_priority, *SURROGATE_KEYS["dim_priority"],
+                                         df_orders[["order_priority"]].rename(columns={"order_priority":"priority"})))
+    keys = _parallel(tasks)
+
+    fact = pd.DataFrame({
+        "order_id": df["order_id"], "order_line": order_line,
+        "order_date_key": _date_key(order_date), "ship_date_key": _date_key(ship_date),
+        "customer_key": keys[0], "product_key": keys[1], "geo_key": keys[2], "ship_key": keys[3],
+        "sales": df["sales"], "quantity": df["quantity"], "discount": df["discount"], "profit": df["profit"],
+        "shipping_cost": df["shipping_cost"], "shipping_days": (ship_date - order_date).dt.days,
+    }, index=df.index)
+    if with_priority:
+        fact["priority_key"] = keys[4]
     return fact
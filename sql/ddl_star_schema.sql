@@ -1,4 +1,4 @@
--- Dimensions
+-- Dimensions (clé de substitution entière + clé naturelle en attribut)
 CREATE TABLE IF NOT EXISTS dim_date (
   date_key     INTEGER PRIMARY KEY,
   date         DATE NOT NULL,
@@ -13,54 +13,87 @@ CREATE TABLE IF NOT EXISTS dim_date (
 );
 
 CREATE TABLE IF NOT EXISTS dim_customer (
-  customer_id   TEXT PRIMARY KEY,
+  customer_key  INTEGER PRIMARY KEY,
+  customer_id   TEXT NOT NULL UNIQUE,
   customer_name TEXT,
   segment       TEXT
 );
 
 CREATE TABLE IF NOT EXISTS dim_product (
-  product_id    TEXT PRIMARY KEY,
+  product_key   INTEGER PRIMARY KEY,
+  product_id    TEXT NOT NULL UNIQUE,
   product_name  TEXT,
   category      TEXT,
   sub_category  TEXT
 );
 
 CREATE TABLE IF NOT EXISTS dim_geography (
-  geo_key     TEXT PRIMARY KEY,
+  geo_key     INTEGER PRIMARY KEY,
   country     TEXT,
   state       TEXT,
   city        TEXT,
   region      TEXT,
   market      TEXT,
-  market2     TEXT
+  market2     TEXT,
+  UNIQUE (country, state, city, region)
 );
 
 CREATE TABLE IF NOT EXISTS dim_ship (
-  ship_mode    TEXT PRIMARY KEY,
+  ship_key     SMALLINT PRIMARY KEY,
+  ship_mode    TEXT NOT NULL UNIQUE,
   speed_bucket TEXT
 );
 
 CREATE TABLE IF NOT EXISTS dim_priority (
-  priority      TEXT PRIMARY KEY,
+  priority_key  SMALLINT PRIMARY KEY,
+  priority      TEXT NOT NULL UNIQUE,
   priority_rank INTEGER
 );
 
--- Faits
+-- Faits : partitionnés par mois sur order_date_key (une partition fact_sales_pYYYYMM par mois,
+-- créée / remplacée par le chargeur)
 CREATE TABLE IF NOT EXISTS fact_sales (
   order_id        TEXT,
   order_line      INTEGER,
   order_date_key  INTEGER REFERENCES dim_date(date_key),
   ship_date_key   INTEGER REFERENCES dim_date(date_key),
-  customer_id     TEXT REFERENCES dim_customer(customer_id),
-  product_id      TEXT REFERENCES dim_product(product_id),
-  geo_key         TEXT REFERENCES dim_geography(geo_key),
-  ship_mode       TEXT REFERENCES dim_ship(ship_mode),
-  priority        TEXT REFERENCES dim_priority(priority),
+  customer_key    INTEGER REFERENCES dim_customer(customer_key),
+  product_key     INTEGER REFERENCES dim_product(product_key),
+  geo_key         INTEGER REFERENCES dim_geography(geo_key),
+  ship_key        SMALLINT REFERENCES dim_ship(ship_key),
+  priority_key    SMALLINT REFERENCES dim_priority(priority_key),
   sales           NUMERIC,
   quantity        INTEGER,
   discount        NUMERIC,
   profit          NUMERIC,
   shipping_cost   NUMERIC,
   shipping_days   INTEGER,
-  PRIMARY KEY (order_id, order_line)
+  PRIMARY KEY (order_id, order_line, order_date_key)
+) PARTITION BY RANGE (order_date_key);
+
+-- Contrôle des chargements (mode incrémental)
+CREATE TABLE IF NOT EXISTS etl_watermark (
+  source          TEXT PRIMARY KEY,
+  fingerprint     TEXT,
+  max_order_date  DATE,
+  loaded_at       TIMESTAMP DEFAULT now()
+);
+
+-- Cube d'agrégats du dashboard (mesures additives, grain = mois x dimensions filtrables)
+CREATE TABLE IF NOT EXISTS agg_sales_cube (
+  yyyymm             INTEGER,
+  market             TEXT,
+  region             TEXT,
+  segment            TEXT,
+  category           TEXT,
+  sub_category       TEXT,
+  ship_mode          TEXT,
+  speed_bucket       TEXT,
+  priority           TEXT,
+  sales              NUMERIC,
+  profit             NUMERIC,
+  quantity           BIGINT,
+  shipping_days_sum  BIGINT,
+  shipping_days_n    BIGINT,
+  n_rows             BIGINT
 );
@@ -1,7 +1,18 @@
-CREATE INDEX IF NOT EXISTS idx_fact_orderdate ON fact_sales(order_date_key);
-CREATE INDEX IF NOT EXISTS idx_fact_shipdate  ON fact_sales(ship_date_key);
-CREATE INDEX IF NOT EXISTS idx_fact_product   ON fact_sales(product_id);
-CREATE INDEX IF NOT EXISTS idx_fact_customer  ON fact_sales(customer_id);
-CREATE INDEX IF NOT EXISTS idx_fact_geo       ON fact_sales(geo_key);
-CREATE INDEX IF NOT EXISTS idx_fact_shipmode  ON fact_sales(ship_mode);
-CREATE INDEX IF NOT EXISTS idx_fact_priority  ON fact_sales(priority);
+-- Index secondaires gérés par le chargeur (etl/load.py) : jamais maintenus ligne à ligne pendant un
+-- chargement en masse, mais construits en bloc une fois les données en place (partitions de fact_sales
+-- en parallèle), suivis d'un ANALYZE. Une instruction "CREATE INDEX IF NOT EXISTS <nom> ON <table> ...;"
+-- par index ; un index absent de ce fichier est supprimé au chargement suivant.
+
+-- fact_sales : partitionnée par mois, chaque partition chargée triée par order_date_key => un résumé
+-- min/max par bloc de pages (BRIN) restreint une période dans les mois de bord, pour quelques Ko au lieu
+-- d'un B-tree par colonne. ship_date_key suit order_date_key à quelques jours près.
+-- Pas d'index par clé de dimension : les filtres du dashboard (market, region, segment, category,
+-- ship_mode, priority) retiennent une large part d'un mois, parcouru plus vite en séquentiel.
+CREATE INDEX IF NOT EXISTS idx_fact_orderdate_brin ON fact_sales USING brin (order_date_key) WITH (pages_per_range = 16);
+CREATE INDEX IF NOT EXISTS idx_fact_shipdate_brin  ON fact_sales USING brin (ship_date_key) WITH (pages_per_range = 16);
+
+-- agg_sales_cube : requêtes du dashboard en pushdown = plage de mois + filtre de marché le plus souvent,
+-- puis agrégats des mesures => index couvrant (parcours d'index seul, sans lecture de la table)
+CREATE INDEX IF NOT EXISTS idx_cube_month_market ON agg_sales_cube (yyyymm, market)
+  INCLUDE (region, segment, category, sub_category, ship_mode, speed_bucket, priority,
+           sales, profit, quantity, shipping_days_sum, shipping_days_n, n_rows);
@@ -0,0 +1,267 @@
+"""Benchmark de bout en bout sur des fichiers synthétiques (cf. tests/synthetic.py).
+
+    python -m tests.benchmark --scales 10k,1M --out data/bench/results.json [--baseline old.json]
+
+Pour chaque échelle : temps et pic mémoire (tracemalloc, 2e exécution) de read_orders (parsing puis
+snapshot), build_dims, assign_keys, build_fact, load_all, publish_dashboard et des callbacks du dashboard
+(rendu complet, curseur Top N seul). Index : requêtes type du dashboard en pushdown (temps d'exécution Postgres + parcours
+du plan) avec les anciens index (v1) puis ceux de sql/indices.sql (v2), et chargement en masse des faits
+avec les index v1 en place contre sans index + reconstruction v2 (rebuild_fact_indexes).
+Les étapes base de données utilisent DB_URL — une base locale jetable : load_all la vide et la recharge.
+Elles sont ignorées si la base est injoignable. Résultats en JSON ; --baseline compare à un run précédent.
+"""
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import pandas as pd
+from sqlalchemy import text
+from etl.config import SNAPSHOT_DIR
+from etl.extract import read_orders, snapshot_path
+from etl.transform import build_dims, assign_keys, build_fact
+from etl.load import (get_engine, load_all, append_table, ensure_partitions, dated_facts, fact_months,
+                      drop_indexes, ensure_indexes, rebuild_fact_indexes, vacuum_analyze)
+from etl.publish import publish_dashboard
+from tests.synthetic import generate, parse_rows
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DASH_DIR = os.path.join(ROOT, "analytics", "dash_app")
+REGRESSION = 1.10  # --baseline : au-delà de +10 % une étape est signalée
+
+# Index avant sql/indices.sql actuel (B-tree mono-colonne) : référence "index v1"
+LEGACY_INDEXES = {
+    "fact_sales": {"idx_fact_orderdate": "(order_date_key)", "idx_fact_shipdate": "(ship_date_key)",
+                   "idx_fact_product": "(product_key)", "idx_fact_customer": "(customer_key)",
+                   "idx_fact_geo": "(geo_key)", "idx_fact_shipmode": "(ship_key)",
+                   "idx_fact_priority": "(priority_key)"},
+    "agg_sales_cube": {"idx_cube_yyyymm": "(yyyymm)"},
+}
+
+# Requêtes type du dashboard en pushdown (données synthétiques 2011-2014) : faits sur une période à
+# cheval sur des mois partiels, cube sur des mois complets ; filtres de dimensions, agrégats des mesures
+QUERY_FROM = """FROM fact_sales f
+    JOIN dim_geography g ON g.geo_key = f.geo_key
+    JOIN dim_product p ON p.product_key = f.product_key"""
+CUBE_QUERY = """SELECT yyyymm, region, category, sub_category, ship_mode, speed_bucket,
+        SUM(sales), SUM(profit), SUM(quantity), SUM(shipping_days_sum), SUM(shipping_days_n), SUM(n_rows)
+    FROM agg_sales_cube WHERE yyyymm BETWEEN :m_lo AND :m_hi{where} GROUP BY 1, 2, 3, 4, 5, 6"""
+FACT_PERIOD = {"lo": 20130315, "hi": 20130614}
+QUERIES = {
+    "faits période": (f"""SELECT g.region, SUM(f.sales), SUM(f.profit) {QUERY_FROM}
+        WHERE f.order_date_key BETWEEN :lo AND :hi GROUP BY 1""", FACT_PERIOD),
+    "faits market": (f"""SELECT p.category, SUM(f.sales), SUM(f.profit) {QUERY_FROM}
+        WHERE f.order_date_key BETWEEN :lo AND :hi AND g.market = ANY(:market) GROUP BY 1""", FACT_PERIOD),
+    "faits market+category": (f"""SELECT g.region, SUM(f.sales), SUM(f.profit), SUM(f.quantity) {QUERY_FROM}
+        WHERE f.order_date_key BETWEEN :lo AND :hi AND g.market = ANY(:market)
+          AND p.category = ANY(:category) GROUP BY 1""", FACT_PERIOD),
+    "cube 2 mois": (CUBE_QUERY.format(where=""), {"m_lo": 201304, "m_hi": 201305}),
+    "cube 2 mois market": (CUBE_QUERY.format(where=" AND market = ANY(:market)"), {"m_lo": 201304, "m_hi": 201305}),
+    "cube 1 an": (CUBE_QUERY.format(where=""), {"m_lo": 201301, "m_hi": 201312}),
+    "cube 1 an market": (CUBE_QUERY.format(where=" AND market = ANY(:market)"), {"m_lo": 201301, "m_hi": 201312}),
+}
+
+def _measure(results: list, scale: str, stage: str, fn, rows: int, memory: bool = True, reset=None):
+    # 1er appel chronométré sans instrumentation ; 2e appel sous tracemalloc pour le pic mémoire
+    # (tracemalloc ralentit fortement le code pandas : les deux mesures ne sont pas mélangées) ;
+    # reset() est appelé avant chaque appel (ex. vider les caches du dashboard)
+    gc.collect()
+    if reset:
+        reset()
+    t0 = time.perf_counter()
+    value = fn()
+    secs = time.perf_counter() - t0
+    peak = None
+    if memory:
+        gc.collect()
+        if reset:
+            reset()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    results.append({"scale": scale, "rows": rows, "stage": stage, "seconds": round(secs, 4),
+                    "peak_mb": round(peak, 1) if peak is not None else None,
+                    "rows_per_sec": round(rows / secs) if secs > 0 else None})
+    print(f"  {scale:>6} {stage:<40} {secs:9.2f}s  " + (f"{peak:9.1f} Mo" if peak is not None else ""))
+    return value
+
+def db_available() -> bool:
+    try:
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception as exc:
+        print(f"⚠️ base injoignable ({type(exc).__name__}) — étapes load_all / dashboard ignorées")
+        return False
+
+def _dashboard():
+    # app.py lit le jeu publié (ou la base) à l'import : (re)chargé à chaque échelle
+    if DASH_DIR not in sys.path:
+        sys.path.insert(0, DASH_DIR)
+    return importlib.reload(sys.modules["app"]) if "app" in sys.modules else importlib.import_module("app")
+
+def use_indexes(eng, legacy: bool = False):
+    # index v1 (LEGACY_INDEXES) ou v2 (sql/indices.sql) de fact_sales (toutes partitions) et du cube
+    with eng.begin() as conn:
+        for table in LEGACY_INDEXES:
+            drop_indexes(conn, table)
+            if not legacy:
+                ensure_indexes(conn, table)
+            for name, spec in (LEGACY_INDEXES[table] if legacy else {}).items():
+                conn.execute(text(f"CREATE INDEX {name} ON {table} {spec}"))
+    vacuum_analyze(eng, list(LEGACY_INDEXES))
+
+def _scans(plan: dict) -> list:
+    out = [f"{plan['Node Type']} {plan.get('Index Name', plan.get('Relation Name', ''))}".strip()
+           ] if "Scan" in plan["Node Type"] else []
+    for child in plan.get("Plans", []):
+        out += _scans(child)
+    return out
+
+def explain(eng, sql: str, params: dict, repeat: int = 3):
+    # -> (meilleur temps d'exécution Postgres en s, parcours distincts du plan hors dimensions)
+    best, scans = None, []
+    with eng.connect() as conn:
+        for _ in range(repeat):
+            plan = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"), params).scalar()[0]
+            secs = plan["Execution Time"] / 1000
+            best = secs if best is None else min(best, secs)
+            scans = sorted({s for s in _scans(plan["Plan"]) if "dim_" not in s})
+    return best, scans
+
+def index_stages(results: list, label: str, rows: int, fact, measure):
+    # requêtes sur l'état laissé par load_all (partitions triées par date), index v1 puis v2
+    eng = get_engine()
+    with eng.connect() as conn:
+        filters = {"market": [conn.execute(text("SELECT min(market) FROM dim_geography")).scalar()],
+                   "category": [conn.execute(text("SELECT min(category) FROM dim_product")).scalar()]}
+    for version in ["v1", "v2"]:
+        use_indexes(eng, legacy=version == "v1")
+        for name, (sql, period) in QUERIES.items():
+            secs, scans = explain(eng, sql, {**filters, **period})
+            stage = f"requête {name} ({version})"
+            results.append({"scale": label, "rows": rows, "stage": stage, "seconds": round(secs, 4),
+                            "peak_mb": None, "rows_per_sec": None, "plan": scans})
+            print(f"  {label:>6} {stage:<40} {secs:9.4f}s  {', '.join(scans)}")
+
+    # chargement en masse des faits : index v1 maintenus ligne à ligne, ou v2 reconstruits en bloc
+    fact = dated_facts(fact)
+
+    def reset_facts(legacy: bool = False):
+        with eng.begin() as conn:
+            conn.execute(text("TRUNCATE TABLE fact_sales"))
+            drop_indexes(conn, "fact_sales")
+            for name, spec in (LEGACY_INDEXES["fact_sales"] if legacy else {}).items():
+                conn.execute(text(f"CREATE INDEX {name} ON fact_sales {spec}"))
+            ensure_partitions(conn, fact_months(fact))
+
+    measure("fact COPY, index v1 en place", lambda: append_table(fact, "fact_sales", eng), heavy=True,
+            reset=lambda: reset_facts(legacy=True))
+    measure("fact COPY + index v2 en bloc",
+            lambda: (append_table(fact, "fact_sales", eng), rebuild_fact_indexes(eng)), heavy=True,
+            reset=reset_facts)
+
+def run_scale(label: str, data_dir: str, seed: int, with_db: bool, memory: bool = True,
+              skip_heavy: bool = False) -> list:
+    rows = parse_rows(label)
+    path = os.path.join(data_dir, f"superstore_{label}.txt")
+    if not os.path.exists(path):
+        print(f"Génération de {path} ...")
+        generate(rows, path, seed)
+    results = []
+
+    def parse():
+        # lecture à froid : snapshot éventuel supprimé avant chaque appel
+        if SNAPSHOT_DIR:
+            os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+            snap = snapshot_path(path)
+            if os.path.exists(snap):
+                os.remove(snap)
+        return read_orders(path)
+
+    def measure(stage, fn, heavy=False, reset=None):
+        return _measure(results, label, stage, fn, rows, memory and not (heavy and skip_heavy), reset)
+
+    measure("read_orders", parse)
+    orders = measure("read_orders (snapshot)", lambda: read_orders(path))
+    dims = measure("build_dims", lambda: build_dims(orders))
+    dims = measure("assign_keys", lambda: assign_keys(dims))
+    fact = measure("build_fact", lambda: build_fact(orders, dims))
+    del orders
+    if with_db:
+        measure("load_all", lambda: load_all(*dims, fact), heavy=True)
+        index_stages(results, label, rows, fact, measure)
+        del fact
+        measure("publish_dashboard", lambda: publish_dashboard(get_engine()), heavy=True)
+        app = measure("dashboard (démarrage)", _dashboard, heavy=True)
+        start, end = app.date_min, app.date_max
+        # caches du dashboard vidés avant chaque appel : coût d'une sélection jamais vue
+        measure("dashboard update()", lambda: app.update(None, None, None, None, None, None, start, end, 12),
+                reset=app.clear_caches)
+        market, category = app.data.options("market")[:1], app.data.options("category")[:1]
+        measure("dashboard update() filtré",
+                lambda: app.update(market, None, None, category, None, None, start, end, 12),
+                reset=app.clear_caches)
+        # curseur Top N seul : jeu filtré déjà calculé, seul le graphe 5 est refait
+        measure("dashboard f_topn seul",
+                lambda: app.update_top_subcat(market, None, None, category, None, None, start, end, 5))
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as fh:
+        old = {(r["scale"], r["stage"]): r for r in json.load(fh)["results"]}
+    print(f"\nComparaison avec {baseline_path} :")
+    for r in results:
+        prev = old.get((r["scale"], r["stage"]))
+        if not prev or not prev["seconds"]:
+            continue
+        ratio = r["seconds"] / prev["seconds"]
+        flag = "  ⚠️ régression" if ratio > REGRESSION else ""
+        print(f"  {r['scale']:>6} {r['stage']:<26} {prev['seconds']:9.2f}s → {r['seconds']:9.2f}s  x{ratio:5.2f}{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="10k,1M", help="ex. 10k,1M,10M,50M")
+    parser.add_argument("--data-dir", default=os.path.join("data", "synthetic"))
+    parser.add_argument("--out", default=os.path.join("data", "bench", "results.json"))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", help="résultats JSON d'un run précédent")
+    parser.add_argument("--no-memory", action="store_true", help="sans passage tracemalloc (2x plus rapide)")
+    parser.add_argument("--light-memory", action="store_true",
+                        help="pas de passage tracemalloc pour load_all / démarrage du dashboard")
+    args = parser.parse_args()
+
+    with_db = db_available()
+    results = []
+    for label in args.scales.split(","):
+        results += run_scale(label.strip(), args.data_dir, args.seed, with_db,
+                             memory=not args.no_memory, skip_heavy=args.light_memory)
+
+    report = {"created": datetime.now(timezone.utc).isoformat(timespec="seconds"), "commit": _git_commit(),
+              "python": platform.python_version(), "pandas": pd.__version__, "platform": platform.platform(),
+              "cpus": os.cpu_count(), "database": with_db, "results": results}
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Résultats : {args.out}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# modules du dashboard importés à plat (comme par analytics/dash_app/app.py)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "analytics", "dash_app")]
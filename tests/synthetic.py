@@ -0,0 +1,162 @@
+"""Générateur déterministe de fichiers au format Global Superstore (tabulé, mêmes colonnes).
+
+    python -m tests.synthetic 1M data/synthetic/superstore_1M.txt [--seed 42]
+
+Même graine + même nb de lignes => même fichier. Les cardinalités suivent le jeu réel
+(~51k lignes : ~25k commandes, ~1,6k clients, ~10k produits, ~3,6k villes / 1,1k états /
+147 pays / 13 régions / 7 marchés, 4 modes d'expédition, 4 priorités) ; clients et produits
+croissent avec la racine du volume, la géographie reste bornée.
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+REAL_ROWS = 51_290
+BATCH_ROWS = 1_000_000
+
+COLUMNS = ["Row ID","Order ID","Order Date","Ship Date","Ship Mode","Customer ID","Customer Name","Segment",
+           "City","State","Country","Postal Code","Market","Region","Product ID","Category","Sub-Category",
+           "Product Name","Sales","Quantity","Discount","Profit","Shipping Cost","Order Priority"]
+
+SHIP_MODES = np.array(["Standard Class","Second Class","First Class","Same Day"])
+SHIP_WEIGHTS = [0.60, 0.20, 0.15, 0.05]
+SHIP_DAYS = {"Standard Class": (4, 7), "Second Class": (2, 5), "First Class": (1, 3), "Same Day": (0, 1)}
+PRIORITIES = np.array(["Medium","High","Critical","Low"])
+PRIORITY_WEIGHTS = [0.57, 0.30, 0.08, 0.05]
+SEGMENTS = np.array(["Consumer","Corporate","Home Office"])
+SEGMENT_WEIGHTS = [0.52, 0.30, 0.18]
+MARKETS = np.array(["APAC","EU","US","LATAM","EMEA","Africa","Canada"])
+REGIONS = np.array(["Central","South","East","West","North","Oceania","Southeast Asia","North Asia",
+                    "Central Asia","Caribbean","Africa","EMEA","Canada"])
+CATEGORIES = {
+    "Office Supplies": ["Binders","Storage","Art","Paper","Supplies","Appliances","Envelopes","Fasteners","Labels"],
+    "Technology": ["Phones","Copiers","Machines","Accessories"],
+    "Furniture": ["Chairs","Bookcases","Tables","Furnishings"],
+}
+CATEGORY_WEIGHTS = [0.61, 0.20, 0.19]
+DISCOUNTS = np.array([0.0, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7])
+DISCOUNT_WEIGHTS = [0.48, 0.12, 0.05, 0.15, 0.06, 0.05, 0.05, 0.02, 0.02]
+WRITE_OPTIONS = pacsv.WriteOptions(include_header=False, delimiter="\t", quoting_style="none")
+FIRST_DAY, N_DAYS = pd.Timestamp("2011-01-01"), 1461
+
+def parse_rows(value: str) -> int:
+    # "10k", "1M", "50M" ou un entier
+    value = value.strip().upper().replace("_", "")
+    mult = {"K": 1_000, "M": 1_000_000}.get(value[-1], 1)
+    return int(float(value.rstrip("KM")) * mult)
+
+def cardinalities(n_rows: int) -> dict:
+    growth = max(1.0, (n_rows / REAL_ROWS) ** 0.5)
+    return {"customers": int(1_590 * growth), "products": int(10_292 * growth),
+            "cities": 3_636, "states": 1_094, "countries": 147}
+
+def _pool(prefix: str, n: int, width: int) -> np.ndarray:
+    return (prefix + pd.Series(np.arange(1, n + 1)).astype(str).str.zfill(width)).to_numpy(dtype=object)
+
+def _reference(rng, card: dict) -> dict:
+    # tables de référence tirées une fois : attributs stables par client / produit / ville
+    countries = _pool("Country ", card["countries"], 3)
+    country_region = rng.integers(0, len(REGIONS), card["countries"])
+    country_market = rng.integers(0, len(MARKETS), card["countries"])
+    state_country = rng.integers(0, card["countries"], card["states"])
+    city_state = rng.integers(0, card["states"], card["cities"])
+    cats = np.array(list(CATEGORIES), dtype=object)
+    prod_cat = rng.choice(len(cats), card["products"], p=CATEGORY_WEIGHTS)
+    prod_sub = np.array([CATEGORIES[cats[c]][i % len(CATEGORIES[cats[c]])]
+                         for c, i in zip(prod_cat, rng.integers(0, 9, card["products"]))], dtype=object)
+    city_country = state_country[city_state]
+    return {
+        "customer_id": _pool("CU-", card["customers"], 6),
+        "customer_name": _pool("Customer ", card["customers"], 6),
+        "segment": SEGMENTS[rng.choice(3, card["customers"], p=SEGMENT_WEIGHTS)],
+        "product_id": _pool("PR-", card["products"], 7),
+        "product_name": _pool("Product ", card["products"], 7),
+        "category": cats[prod_cat], "sub_category": prod_sub,
+        "base_price": rng.lognormal(4.0, 1.1, card["products"]).round(2),
+        "city": _pool("City ", card["cities"], 4),
+        "state": _pool("State ", card["states"], 4)[city_state],
+        "country": countries[city_country],
+        "region": REGIONS[country_region[city_country]],
+        "market": MARKETS[country_market[city_country]],
+    }
+
+def _batch(rng, ref: dict, n: int, first_order: int, first_row: int):
+    # -> (lignes, nb de commandes) ; commandes de 1 à 6 lignes, client, géographie, dates,
+    # mode d'expédition et priorité constants au sein d'une commande
+    sizes = rng.choice(np.arange(1, 7), n, p=[0.40, 0.25, 0.15, 0.10, 0.06, 0.04])
+    sizes = sizes[: np.searchsorted(np.cumsum(sizes), n) + 1]
+    sizes[-1] -= sizes.sum() - n
+    n_orders = len(sizes)
+    line_order = np.repeat(np.arange(n_orders), sizes)
+
+    order_day = np.sort(rng.integers(0, N_DAYS, n_orders))
+    mode = rng.choice(len(SHIP_MODES), n_orders, p=SHIP_WEIGHTS)
+    lo = np.array([SHIP_DAYS[m][0] for m in SHIP_MODES])[mode]
+    hi = np.array([SHIP_DAYS[m][1] for m in SHIP_MODES])[mode]
+    ship_day = order_day + rng.integers(lo, hi + 1)
+    customer = rng.integers(0, len(ref["customer_id"]), n_orders)
+    city = rng.integers(0, len(ref["city"]), n_orders)
+    priority = rng.choice(len(PRIORITIES), n_orders, p=PRIORITY_WEIGHTS)
+
+    product = rng.integers(0, len(ref["product_id"]), n)
+    quantity = rng.integers(1, 15, n)
+    discount = rng.choice(DISCOUNTS, n, p=DISCOUNT_WEIGHTS)
+    sales = (ref["base_price"][product] * quantity * (1 - discount)).round(2)
+    profit = (sales * (rng.normal(0.25, 0.15, n) - discount * 1.2)).round(2)
+    shipping = (sales * rng.uniform(0.02, 0.15, n)).round(2)
+
+    dates = FIRST_DAY + pd.to_timedelta(order_day, unit="D")
+    ships = FIRST_DAY + pd.to_timedelta(ship_day, unit="D")
+    order_ids = pd.Series(np.arange(first_order, first_order + n_orders)).astype(str).str.zfill(9)
+    years = pd.Series(dates.year).astype(str)
+    c, g = customer[line_order], city[line_order]
+    return pd.DataFrame({
+        "Row ID": np.arange(first_row, first_row + n),
+        "Order ID": ("SO-" + years + "-" + order_ids).to_numpy(dtype=object)[line_order],
+        "Order Date": dates.strftime("%Y-%m-%d").to_numpy(dtype=object)[line_order],
+        "Ship Date": ships.strftime("%Y-%m-%d").to_numpy(dtype=object)[line_order],
+        "Ship Mode": SHIP_MODES[mode][line_order],
+        "Customer ID": ref["customer_id"][c],
+        "Customer Name": ref["customer_name"][c],
+        "Segment": ref["segment"][c],
+        "City": ref["city"][g], "State": ref["state"][g], "Country": ref["country"][g],
+        "Postal Code": "",
+        "Market": ref["market"][g], "Region": ref["region"][g],
+        "Product ID": ref["product_id"][product],
+        "Category": ref["category"][product], "Sub-Category": ref["sub_category"][product],
+        "Product Name": ref["product_name"][product],
+        "Sales": sales, "Quantity": quantity, "Discount": discount, "Profit": profit,
+        "Shipping Cost": shipping,
+        "Order Priority": PRIORITIES[priority][line_order],
+    }, columns=COLUMNS), n_orders
+
+def generate(n_rows: int, path: str, seed: int = 42) -> str:
+    # écrit par lots de BATCH_ROWS lignes (mémoire bornée), chaque lot a sa propre graine dérivée ;
+    # valeurs générées sans tabulation / guillemet => pas de quoting (même forme que le fichier réel)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    ref = _reference(np.random.default_rng([seed, 0]), cardinalities(n_rows))
+    tmp = f"{path}.tmp"
+    next_order = 1
+    with open(tmp, "wb") as fh:
+        fh.write(("\t".join(COLUMNS) + "\n").encode("utf-8"))
+        for i, start in enumerate(range(0, n_rows, BATCH_ROWS)):
+            n = min(BATCH_ROWS, n_rows - start)
+            df, n_orders = _batch(np.random.default_rng([seed, i + 1]), ref, n, next_order, start + 1)
+            pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), fh, WRITE_OPTIONS)
+            next_order += n_orders
+    os.replace(tmp, path)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", help="nb de lignes : 10k, 1M, 10M, 50M ...")
+    parser.add_argument("path")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(generate(parse_rows(args.rows), args.path, args.seed))
+
+if __name__ == "__main__":
+    main()
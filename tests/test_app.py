@@ -0,0 +1,94 @@
+import importlib
+import sys
+import threading
+import pandas as pd
+import pyarrow as pa
+import pytest
+from backends import FILTER_DIMS, rows_to_cube
+from etl import extract
+from etl.publish import _write_store
+from etl.transform import _bucket_ship
+from tests.synthetic import generate
+
+PERIOD = ("2012-03-15", "2013-06-14")
+
+@pytest.fixture(scope="module")
+def rows(tmp_path_factory):
+    path = generate(20_000, str(tmp_path_factory.mktemp("synthetic") / "superstore.txt"), seed=11)
+    snapshot_dir, extract.SNAPSHOT_DIR = extract.SNAPSHOT_DIR, ""
+    try:
+        orders = extract.read_orders(path)
+    finally:
+        extract.SNAPSHOT_DIR = snapshot_dir
+    rows = orders.rename(columns={"order_priority": "priority"}).assign(
+        speed_bucket=orders["ship_mode"].map(_bucket_ship),
+        shipping_days=(orders["ship_date"] - orders["order_date"]).dt.days)
+    return rows.sort_values("order_date", kind="stable").reset_index(drop=True)
+
+@pytest.fixture(scope="module")
+def app(rows, tmp_path_factory):
+    # jeu publié (comme etl.publish) dans un dossier temporaire : le dashboard démarre sans base
+    root = tmp_path_factory.mktemp("dashboard")
+    (root / "v1").mkdir()
+    cube = rows_to_cube(rows).sort_values("yyyymm", kind="stable").reset_index(drop=True)
+    for name, df in [("rows", rows), ("cube", cube)]:
+        _write_store([(pa.Table.from_pandas(df, preserve_index=False), df[FILTER_DIMS])], str(root / "v1" / name))
+    (root / "CURRENT").write_text("v1")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("DASH_BACKEND", "memory")
+        mp.setenv("DASH_SNAPSHOT_DIR", str(root))
+        mp.setenv("DASH_METRICS_DIR", "")
+        sys.modules.pop("app", None)
+        yield importlib.import_module("app")
+    sys.modules.pop("app", None)
+
+@pytest.fixture
+def cube_calls(app, monkeypatch):
+    # appels de cube_slice (calcul du jeu filtré) sur le backend en service, caches vidés
+    calls, data = [], app.current_data()
+    real = data.cube_slice
+    monkeypatch.setattr(data, "cube_slice", lambda *a: calls.append(a) or real(*a))
+    app.clear_caches()
+    return calls
+
+def test_filter_key_ignores_value_order_and_empty_lists(app):
+    assert app._key([["US", "EU"], [], None, *PERIOD]) == app._key([["EU", "US"], None, None, *PERIOD])
+    assert app._key([["EU"], None, None, *PERIOD]) != app._key([["EU"], None, None, PERIOD[0], "2013-06-15"])
+
+def test_callbacks_share_one_filtered_set(app, cube_calls):
+    f = (["EU", "US"], None, ["Consumer"], None, None, None, *PERIOD)
+    g = (["US", "EU"], [], ["Consumer"], [], None, None, *PERIOD)
+    app.update_kpis(*f)
+    app.update_month(*g)
+    app.update_category(*f)
+    app.update_top_subcat(*f, 5)
+    app.update_top_subcat(*g, 10)   # curseur Top N : pas de nouveau calcul
+    app.update_region(*g)
+    app.update_ship_speed(*f)
+    assert len(cube_calls) == 1
+    app.update_kpis(*f[:-1], "2013-06-15")
+    assert len(cube_calls) == 2
+
+def test_concurrent_callbacks_compute_once(app, cube_calls):
+    f = (["EU"], None, None, ["Technology"], None, None, *PERIOD)
+    start = threading.Barrier(4)
+    callbacks = [app.update_kpis, app.update_month, app.update_category, app.update_region]
+
+    def run(callback):
+        start.wait()
+        callback(*f)
+
+    threads = [threading.Thread(target=run, args=(cb,)) for cb in callbacks]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert len(cube_calls) == 1
+
+def test_kpis_match_rows(app, rows):
+    f = (["EU", "US"], None, ["Consumer"], None, None, None, *PERIOD)
+    sel = rows[rows["market"].isin(f[0]) & rows["segment"].isin(f[2])
+               & rows["order_date"].between(pd.Timestamp(PERIOD[0]), pd.Timestamp(PERIOD[1]))]
+    sales, profit, _, shipdays = app.update_kpis(*f)
+    assert sales == app.fmt_money(sel["sales"].sum()) and profit == app.fmt_money(sel["profit"].sum())
+    assert shipdays == app.fmt_days(sel["shipping_days"].mean())
@@ -0,0 +1,96 @@
+import threading
+import numpy as np
+from cache import LRUCache
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_evicts_least_recently_used():
+    c = LRUCache(maxsize=2)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1          # "a" devient le plus récent
+    c.put("c", 3)                   # => "b" évincé
+    assert c.get("b") is None and c.get("a") == 1 and c.get("c") == 3
+    c.put("a", 10)                  # remplacement : pas d'éviction, "a" en tête
+    c.put("d", 4)
+    assert len(c) == 2 and c.get("c") is None and c.get("a") == 10
+
+def test_ttl_expiry():
+    clock = Clock()
+    c = LRUCache(maxsize=8, ttl=60, clock=clock)
+    c.put("k", "v")
+    clock.now = 60
+    assert c.get("k") == "v"
+    clock.now = 60.5
+    assert c.get("k", "absent") == "absent" and len(c) == 0
+    calls = []
+    assert c.get_or_compute("k", lambda: calls.append(1) or "v2") == "v2"
+    clock.now = 100
+    assert c.get_or_compute("k", lambda: calls.append(1) or "v3") == "v2"
+    assert len(calls) == 1
+
+def test_concurrent_callers_share_one_computation():
+    c = LRUCache()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    owner = threading.Thread(target=lambda: results.append(c.get_or_compute("k", compute)))
+    owner.start()
+    assert started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(c.get_or_compute("k", compute))) for _ in range(4)]
+    for t in waiters:
+        t.start()
+    release.set()
+    for t in [owner, *waiters]:
+        t.join(5)
+    assert calls == [1] and results == ["value"] * 5
+
+def test_error_is_shared_and_not_cached():
+    c = LRUCache()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            c.get_or_compute("k", failing)
+        except ValueError as exc:
+            errors.append(str(exc))
+
+    owner = threading.Thread(target=call)
+    owner.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert errors == ["boom", "boom"] and len(c) == 0
+    assert c.get_or_compute("k", lambda: 1) == 1
+
+def test_maxbytes_bounds_cached_arrays():
+    c = LRUCache(maxsize=100, maxbytes=1000)
+    for k in range(5):
+        c.put(k, np.zeros(50, dtype=np.int64))     # 400 octets chacun
+    assert len(c) == 2 and c.nbytes == 800 and c.get(3) is not None
+    c.put(3, np.zeros(10, dtype=np.int64))          # remplacement : taille recomptée
+    assert c.nbytes == 480
+    c.put("big", np.zeros(1000, dtype=np.int64))    # seule entrée gardée, même au-delà du plafond
+    assert len(c) == 1 and c.nbytes == 8000
+    c.clear()
+    assert c.nbytes == 0
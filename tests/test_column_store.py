@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from column_store import ColumnStore
+from etl import extract
+from etl.publish import _Bitmaps
+from tests.synthetic import generate
+
+DIMS = ["market","region","segment","category","ship_mode","priority"]
+FILTERS = [
+    {},
+    {"market": ["EU"]},
+    {"market": ["EU", "US"], "segment": ["Consumer"]},
+    {"category": ["Technology"], "ship_mode": ["Same Day", "First Class"], "priority": ["High"]},
+    {"region": ["Central", "South"], "category": ["Furniture"], "segment": []},
+    {"market": ["Atlantis"]},
+    {"market": ["EU"], "region": ["Oceania", "Caribbean"], "segment": ["Home Office"], "priority": ["Critical"]},
+]
+PERIODS = [(None, None), ("2012-03-15", "2012-06-14"), ("2013-01-01", "2013-01-01"),
+           ("2014-12-01", None), (None, "2011-02-28"), ("2015-01-01", "2015-12-31")]
+
+@pytest.fixture(scope="module")
+def rows(tmp_path_factory):
+    path = generate(30_000, str(tmp_path_factory.mktemp("synthetic") / "superstore.txt"), seed=3)
+    snapshot_dir, extract.SNAPSHOT_DIR = extract.SNAPSHOT_DIR, ""
+    try:
+        df = extract.read_orders(path)
+    finally:
+        extract.SNAPSHOT_DIR = snapshot_dir
+    # ordre du fichier mélangé : le stockage trie lui-même par date
+    return df.rename(columns={"order_priority": "priority"}).sample(frac=1, random_state=0).reset_index(drop=True)
+
+def _kpis(df: pd.DataFrame) -> tuple:
+    return (len(df), round(df["sales"].sum(), 4), round(df["profit"].sum(), 4), int(df["quantity"].sum()),
+            df["order_id"].nunique())
+
+def _pandas(rows: pd.DataFrame, filters: dict, lo, hi) -> pd.DataFrame:
+    mask = pd.Series(True, index=rows.index)
+    for col, values in filters.items():
+        if values:
+            mask &= rows[col].isin(values)
+    if lo is not None:
+        mask &= rows["order_date"] >= pd.Timestamp(lo)
+    if hi is not None:
+        mask &= rows["order_date"] <= pd.Timestamp(hi)
+    return rows[mask]
+
+def _published(rows: pd.DataFrame) -> tuple:
+    # jeu trié par date + bitmaps déjà calculés, comme etl.publish (lots multiples de 8 lignes)
+    frame = rows.sort_values("order_date", kind="stable").reset_index(drop=True)
+    bitmaps = _Bitmaps(DIMS)
+    for start in range(0, len(frame), 4096):
+        bitmaps.add(frame.iloc[start:start + 4096])
+    table = bitmaps.table().to_pydict()
+    out = {}
+    for dim, value, bits in zip(table["dim"], table["value"], table["bits"]):
+        out.setdefault(dim, {})[value] = np.frombuffer(bits, dtype=np.uint8)
+    return frame, out
+
+@pytest.mark.parametrize("published", [False, True])
+def test_filtered_kpis_match_pandas(rows, published):
+    if published:
+        frame, bitmaps = _published(rows)
+        store = ColumnStore(frame, DIMS, "order_date", bitmaps=bitmaps)
+    else:
+        store = ColumnStore(rows, DIMS, "order_date")
+    for filters in FILTERS:
+        for lo, hi in PERIODS:
+            got = store.take(store.select(filters, lo, hi))
+            assert _kpis(got) == _kpis(_pandas(rows, filters, lo, hi)), (filters, lo, hi)
+            assert got["order_date"].is_monotonic_increasing
+
+def test_cached_selection_ignores_value_order(rows):
+    store = ColumnStore(rows, DIMS, "order_date")
+    a = store.select({"market": ["EU", "US"]}, "2012-01-01", "2012-12-31")
+    b = store.select({"market": ["US", "EU"]}, "2012-01-01", "2012-12-31")
+    assert a is b
+    assert store.options("ship_mode") == sorted(rows["ship_mode"].unique())
+    lo, hi = store.date_bounds()
+    assert pd.Timestamp(lo) == rows["order_date"].min() and pd.Timestamp(hi) == rows["order_date"].max()
+
+def test_period_only_selection_is_a_slice(rows):
+    store = ColumnStore(rows, DIMS, "order_date", cache_bytes=64 * 2**10)
+    sel = store.select({"segment": []}, "2012-03-15", "2012-06-14")
+    assert isinstance(sel, slice) and len(store._cache) == 0
+    assert len(store.take(sel)) == len(_pandas(rows, {}, "2012-03-15", "2012-06-14"))
+    # positions en cache bornées en octets (64 Ko) quel que soit le nb d'entrées
+    for lo, hi in PERIODS:
+        for filters in FILTERS[1:]:
+            store.select(filters, lo, hi)
+    assert store._cache.nbytes <= 64 * 2**10 or len(store._cache) == 1
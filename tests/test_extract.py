@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from etl import extract
+
+HEADER = "Row ID\tOrder ID\tOrder Date\tShip Date\tShip Mode\tSales\tQuantity\tDiscount\tProfit\tShipping Cost\n"
+ROWS = [
+    "1\tA-1\t2014-01-02\t2014-01-05\tSecond Class\t120.5\t2\t0\t10.25\t3.5\n",
+    "2\tA-2\t2014-01-03\t2014-01-06\tSame Day\t12,5O\t3\t0.1\t-2\t1\n",
+    "3\tA-3\t2014-01-04\t2014-01-07\tFirst Class\t80\t2.5\t0.2\t4\t2\n",
+    "4\tA-4\t2014-01-05\t2014-01-08\tFirst Class\t99.9\t1\t0\t5\tn/a\n",
+]
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract, "SNAPSHOT_DIR", "")
+    path = tmp_path / "orders.txt"
+    path.write_text(HEADER + "".join(ROWS), encoding="utf-8")
+    return str(path)
+
+def test_dirty_numeric_cell_becomes_nan(source):
+    df = extract.read_orders(source)
+    assert len(df) == 4
+    assert df["sales"].dtype == "float64"
+    assert df["sales"].tolist()[0] == 120.5 and pd.isna(df["sales"][1])
+    # quantité non entière => absente ; coût d'expédition invalide => absent
+    assert df["quantity"].dtype == "Int64"
+    assert df["quantity"].isna().tolist() == [False, False, True, False]
+    assert pd.isna(df["shipping_cost"][3])
+
+def test_batches_keep_types_across_dirty_batch(source):
+    batches = list(extract.iter_orders(source, chunksize=1))
+    assert len(batches) == 4
+    assert {b["sales"].dtype.name for b in batches} == {"float64"}
+    assert {b["quantity"].dtype.name for b in batches} == {"Int64"}
+    assert pd.isna(batches[1]["sales"].iloc[0])
+
+def test_decimal_comma(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract, "SNAPSHOT_DIR", "")
+    monkeypatch.setattr(extract, "DECIMAL", ",")
+    path = tmp_path / "orders.txt"
+    path.write_text("Order ID;Sales;Quantity\nA-1;12,5;2\nA-2;x;1\n", encoding="utf-8")
+    df = extract.read_orders(str(path))
+    assert df["sales"].iloc[0] == 12.5 and pd.isna(df["sales"].iloc[1])
+
+def test_single_source_fingerprint_uses_hash_index(source, tmp_path, monkeypatch):
+    monkeypatch.setattr(extract, "SNAPSHOT_DIR", str(tmp_path / "cache"))
+    (tmp_path / "cache").mkdir()
+    expected = extract.fingerprint(source)
+    assert extract.sources_fingerprint(source) == expected
+    # 2e appel : taille/mtime inchangés => empreinte relue de l'index, fichier non relu
+    monkeypatch.setattr(extract, "fingerprint", lambda *a, **k: pytest.fail("fichier re-haché"))
+    assert extract.sources_fingerprint(source) == expected
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from etl.load import (CopyStream, _copy_text, dated_facts, declared_indexes, fact_months, partition_bounds,
+                      partition_name)
+
+def test_copy_text_escapes_and_nulls():
+    df = pd.DataFrame({"id": ["a\tb", "c\\d", "e\nf\rg", None, "\\N"],
+                       "n": pd.array([1, None, 3, 4, 5], dtype="Int64"),
+                       "x": [1.5, np.nan, 0.0, -2.25, 1e-7]})
+    lines = _copy_text(df).split("\n")
+    assert lines[-1] == "" and len(lines) == 6
+    assert lines[:5] == ["a\\tb\t1\t1.5", "c\\\\d\t\\N\t\\N", "e\\nf\\rg\t3\t0.0", "\\N\t4\t-2.25", "\\\\N\t5\t1e-07"]
+    assert _copy_text(df.iloc[:0]) == ""
+
+def test_copy_text_leaves_clean_text_untouched():
+    df = pd.DataFrame({"s": pd.array(["x y", "é", None], dtype="str"), "d": pd.to_datetime(["2014-01-02"] * 3)})
+    assert _copy_text(df) == "x y\t2014-01-02\né\t2014-01-02\n\\N\t2014-01-02\n"
+
+def test_copy_stream_reads_whole_text_in_small_pieces():
+    df = pd.DataFrame({"a": range(1000), "b": ["v\t"] * 1000})
+    stream = CopyStream(df, rows=64)
+    pieces = iter(lambda: stream.read(100), "")
+    assert "".join(pieces) == _copy_text(df)
+    assert stream.read(100) == ""
+
+def test_partition_bounds():
+    assert partition_bounds(201401) == (20140100, 20140200)
+    assert partition_bounds(201412) == (20141200, 20150100)
+    assert partition_name(201412) == "fact_sales_p201412"
+    # toutes les dates du mois dans [lo, hi[, aucune du mois suivant
+    lo, hi = partition_bounds(201402)
+    assert lo <= 20140201 and 20140228 < hi <= 20140301
+
+def test_fact_months_and_undated_rows():
+    fact = pd.DataFrame({"order_date_key": pd.array([20140105, None, 20131231, 20140131], dtype="Int64")})
+    assert fact_months(fact) == [201312, 201401]
+    assert dated_facts(fact)["order_date_key"].tolist() == [20140105, 20131231, 20140131]
+
+def test_declared_indexes_repo_file():
+    fact = declared_indexes("fact_sales")
+    assert fact == {"idx_fact_orderdate_brin": "USING brin (order_date_key) WITH (pages_per_range = 16)",
+                    "idx_fact_shipdate_brin": "USING brin (ship_date_key) WITH (pages_per_range = 16)"}
+    cube = declared_indexes("agg_sales_cube")
+    assert list(cube) == ["idx_cube_month_market"]
+    assert cube["idx_cube_month_market"].startswith("(yyyymm, market) INCLUDE (region, segment,")
+    assert "\n" not in cube["idx_cube_month_market"]
+    assert declared_indexes("dim_date") == {}
+
+def test_declared_indexes_ignores_comments_and_other_tables(tmp_path):
+    path = tmp_path / "indices.sql"
+    path.write_text("-- CREATE INDEX IF NOT EXISTS old ON t (a);\n"
+                    "CREATE INDEX IF NOT EXISTS a_idx ON t\n  (a, b);  -- commentaire\n"
+                    "CREATE INDEX IF NOT EXISTS b_idx ON t2 (b);\n"
+                    "CREATE INDEX IF NOT EXISTS c_idx ON t USING brin (c);\n")
+    assert declared_indexes("t", str(path)) == {"a_idx": "(a, b)", "c_idx": "USING brin (c)"}
@@ -0,0 +1,47 @@
+import json
+import os
+from metrics import CallbackMetrics
+
+def test_files_are_per_process(tmp_path):
+    stale = tmp_path / "dash.999999999.prom"   # pid hors plage : processus terminé
+    stale.write_text("dash_callback_calls_total{callback=\"kpis\",pid=\"999999999\"} 3\n")
+    m = CallbackMetrics(str(tmp_path), flush_every=0)
+    fn = m.instrument("kpis")(lambda n: m.rows(n) or {"n": n})
+    assert fn(5) == {"n": 5} and fn(7) == {"n": 7}
+    pid = os.getpid()
+    assert sorted(os.listdir(tmp_path)) == [f"dash.{pid}.prom", f"dash_metrics.{pid}.jsonl"]
+    lines = [json.loads(l) for l in (tmp_path / f"dash_metrics.{pid}.jsonl").read_text().splitlines()]
+    assert [l["rows"] for l in lines] == [5, 7]
+    prom = (tmp_path / f"dash.{pid}.prom").read_text()
+    assert f'dash_callback_calls_total{{callback="kpis",pid="{pid}"}} 2' in prom
+
+def test_counters_restart_in_forked_worker(tmp_path):
+    m = CallbackMetrics(str(tmp_path), flush_every=0)
+    fn = m.instrument("kpis")(lambda: 1)
+    fn()
+    m._pid = -1   # comme un worker forké après des appels du parent
+    fn()
+    assert 'dash_callback_calls_total{callback="kpis"' in m.prometheus()
+    assert m._calls["kpis"]["count"] == 1
+
+def test_response_bytes_read_from_dash_response(tmp_path):
+    from dash import Dash, Input, Output, dcc, html
+    m = CallbackMetrics(str(tmp_path), flush_every=0)
+    app = Dash(__name__)
+    app.layout = html.Div([dcc.Input(id="n", value=3), html.Div(id="out")])
+    m.attach(app.server)
+
+    @app.callback(Output("out", "children"), Input("n", "value"))
+    @m.instrument("out")
+    def out(n):
+        return "x" * int(n)
+
+    body = {"output": "out.children", "outputs": {"id": "out", "property": "children"},
+            "inputs": [{"id": "n", "property": "value", "value": 500}], "changedPropIds": ["n.value"]}
+    resp = app.server.test_client().post("/_dash-update-component", json=body)
+    assert resp.status_code == 200
+    line = json.loads((tmp_path / f"dash_metrics.{os.getpid()}.jsonl").read_text())
+    assert line["response_bytes"] == len(resp.data) > 500
+    # appel direct (hors requête) : enregistré tout de suite, sans taille
+    out(1)
+    assert m._calls["out"]["count"] == 2 and m._calls["out"]["bytes"] == len(resp.data)
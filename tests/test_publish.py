@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from etl import publish
+from etl.publish import _Bitmaps, _merged_tables, _month_keys, _write_store
+from snapshot import FILTER_DIMS, read_store
+
+def _rows(months: dict, tag: float) -> pd.DataFrame:
+    # {yyyymm: nb de lignes} -> lignes triées par date, dimensions tirées au hasard
+    rng = np.random.default_rng(int(tag))
+    dates = [pd.Timestamp(year=m // 100, month=m % 100, day=1 + i % 28) for m, n in months.items() for i in range(n)]
+    df = pd.DataFrame({"order_date": pd.to_datetime(sorted(dates))})
+    for col in FILTER_DIMS:
+        df[col] = pd.array(rng.choice(["a", "b", "c"], len(df)).astype(object), dtype="str")
+    df["sales"] = tag + np.arange(len(df), dtype=np.float64)
+    return df
+
+def _bits(frame: pd.DataFrame) -> dict:
+    # bitmaps attendus, calculés en une fois sur le jeu complet
+    out = {}
+    for col in FILTER_DIMS:
+        codes, uniques = pd.factorize(frame[col])
+        out[col] = {v: np.packbits(codes == i) for i, v in enumerate(uniques)}
+    return out
+
+def test_bitmaps_by_batch_match_full_frame():
+    df = pd.DataFrame({"market": ["EU"] * 16 + ["US"] * 8 + ["EU", "APAC", "EU"], "segment": ["x"] * 27})
+    bitmaps = _Bitmaps(["market", "segment"])
+    for start in range(0, len(df), 8):
+        bitmaps.add(df.iloc[start:start + 8])
+    table = bitmaps.table().to_pydict()
+    got = {(d, v): np.frombuffer(b, dtype=np.uint8) for d, v, b in zip(table["dim"], table["value"], table["bits"])}
+    assert list(got) == [("market", "EU"), ("market", "US"), ("market", "APAC"), ("segment", "x")]
+    for (dim, value), bits in got.items():
+        # valeurs vues tardivement : lots précédents complétés par des zéros ; même longueur pour toutes
+        assert np.array_equal(bits, np.packbits(df[dim].to_numpy() == value)), (dim, value)
+    assert bitmaps.nbytes == 4
+
+def test_month_keys():
+    table = pa.table({"order_date": pd.to_datetime(["2013-12-31", "2014-01-01", "1969-12-31"]),
+                      "yyyymm": [201312, 201401, 196912]})
+    assert _month_keys(table, "order_date").tolist() == [201312, 201401, 196912]
+    assert _month_keys(table, "yyyymm").tolist() == [201312, 201401, 196912]
+
+@pytest.mark.parametrize("read_rows", [8, 16, 1 << 18])
+def test_merged_tables_splices_months(tmp_path, monkeypatch, read_rows):
+    prev = _rows({201401: 5, 201402: 7, 201403: 3, 201405: 6}, tag=1000)
+    db = _rows({201402: 4, 201404: 9}, tag=2000)          # 201403 supprimé en base, 201404 nouveau
+    path = str(tmp_path / "rows")
+    table = pa.Table.from_pandas(prev, preserve_index=False)
+    assert _write_store([(table, prev[FILTER_DIMS])], path) == len(prev)
+
+    def db_tables(conn, query, params, measures, text_cols, schema=None):
+        assert params == {"months": [201404, 201402, 201403]}
+        df = db[_month_keys(pa.Table.from_pandas(db), "order_date") != 201403]
+        yield pa.Table.from_pandas(df, schema=schema, preserve_index=False), df
+
+    monkeypatch.setattr(publish, "_db_tables", db_tables)
+    monkeypatch.setattr(publish, "READ_ROWS", read_rows)
+    tables = list(_merged_tables(None, "", path, "order_date", [201404, 201402, 201403], ["sales"], []))
+    assert all(t.num_rows <= read_rows for t, _ in tables)
+    out = str(tmp_path / "merged")
+    _write_store(tables, out)
+
+    month = prev["order_date"].dt.year * 100 + prev["order_date"].dt.month
+    expected = pd.concat([prev[month == 201401], db, prev[month == 201405]], ignore_index=True)
+    frame, bitmaps = read_store(out)
+    assert frame["sales"].tolist() == expected["sales"].tolist()
+    assert frame["order_date"].is_monotonic_increasing
+    for dim, values in _bits(expected).items():
+        assert bitmaps[dim].keys() == values.keys()
+        for value, bits in values.items():
+            assert np.array_equal(bitmaps[dim][value], bits), (dim, value)
+
+def test_merged_tables_without_db_rows_drops_months(tmp_path, monkeypatch):
+    prev = _rows({201401: 3, 201402: 4}, tag=10)
+    path = str(tmp_path / "rows")
+    _write_store([(pa.Table.from_pandas(prev, preserve_index=False), prev[FILTER_DIMS])], path)
+    monkeypatch.setattr(publish, "_db_tables", lambda *args: iter(()))
+    tables = list(_merged_tables(None, "", path, "order_date", [201402], ["sales"], []))
+    assert sum(t.num_rows for t, _ in tables) == 3
+    assert tables[0][0]["sales"].to_pylist() == [10.0, 11.0, 12.0]
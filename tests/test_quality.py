@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+from etl.quality import Validator, QuarantineSink, load_rules, REASON_COLUMN
+
+def _orders(**cols) -> pd.DataFrame:
+    base = {"row_id": [1, 2, 3, 4], "order_id": ["A", "B", "C", "D"],
+            "sales": [10.0, 20.0, 30.0, 40.0], "quantity": pd.array([1, 2, 3, 4], dtype="Int64"),
+            "discount": [0.0, 0.1, 0.2, 0.3], "ship_mode": ["First Class"] * 4,
+            "order_date": pd.to_datetime(["2014-01-01"] * 4), "ship_date": pd.to_datetime(["2014-01-03"] * 4)}
+    base.update(cols)
+    return pd.DataFrame(base)
+
+def _failed(rule: dict, df: pd.DataFrame) -> list:
+    v = Validator([{"severity": "error", **rule}])
+    return list(np.flatnonzero(v.codes(df)))
+
+def test_not_null():
+    df = _orders(order_id=["A", None, "nan", "D"], sales=[1.0, 2.0, 3.0, np.nan])
+    assert _failed({"code": "M", "type": "not_null", "columns": ["order_id", "sales"]}, df) == [1, 2, 3]
+
+def test_range():
+    df = _orders(discount=[-0.1, 0.0, 1.0, 1.5], quantity=pd.array([1, None, 0, 2], dtype="Int64"))
+    assert _failed({"code": "D", "type": "range", "column": "discount", "min": 0, "max": 1}, df) == [0, 3]
+    # valeur absente : pas un échec de plage (cf. not_null)
+    assert _failed({"code": "Q", "type": "range", "column": "quantity", "min": 1}, df) == [2]
+    rule = {"code": "T", "type": "range", "column": "order_date", "min": "2014-01-02"}
+    assert _failed(rule, _orders(order_date=pd.to_datetime(["2014-01-01", "2014-01-02", None, "2015-01-01"]))) == [0]
+
+def test_referential():
+    df = _orders(ship_mode=["First Class", "Teleport", "nan", "Same Day"])
+    rule = {"code": "S", "type": "referential", "column": "ship_mode", "values": ["First Class", "Same Day"]}
+    assert _failed(rule, df) == [1]
+
+def test_compare():
+    df = _orders(ship_date=pd.to_datetime(["2014-01-03", "2013-12-31", None, "2014-01-01"]))
+    rule = {"code": "C", "type": "compare", "left": "ship_date", "op": ">=", "right": "order_date"}
+    assert _failed(rule, df) == [1]
+
+def test_unique_within_batch_keeps_first():
+    df = _orders(row_id=[1, 2, 1, None])
+    assert _failed({"code": "U", "type": "unique", "columns": ["row_id"]}, df) == [2]
+
+def test_unique_across_batches():
+    v = Validator([{"code": "U", "type": "unique", "columns": ["row_id"], "severity": "error"}])
+    kept = [v.split(_orders(row_id=ids)) for ids in ([1, 2, 3, 4], [5, 6, 7, 8], [9, 3, 10, 6])]
+    assert [len(k) for k in kept] == [4, 4, 2]
+    assert kept[2]["row_id"].tolist() == [9, 10]
+    assert v.summary()["failed"] == {"U": 2}
+
+def test_unique_across_many_batches():
+    # suites triées fusionnées au fil des lots : un doublon du 1er lot reste vu au dernier
+    v = Validator([{"code": "U", "type": "unique", "columns": ["row_id"], "severity": "error"}])
+    for start in range(0, 1000, 10):
+        assert len(v.split(pd.DataFrame({"row_id": range(start, start + 10)}))) == 10
+    assert len(v.split(pd.DataFrame({"row_id": [0, 999, 1000]}))) == 1
+
+def test_warn_rows_are_kept_and_counted():
+    df = _orders(ship_mode=["First Class", "Teleport", "First Class", "First Class"])
+    v = Validator([{"code": "S", "type": "referential", "column": "ship_mode",
+                    "values": ["First Class"], "severity": "warn"}])
+    assert len(v.split(df)) == 4
+    assert v.summary() == {"rows": 4, "quarantined": 0, "quarantine_path": None, "failed": {"S": 1}}
+
+def test_missing_column():
+    v = Validator([{"code": "R", "type": "range", "column": "profit", "min": 0, "severity": "error"}])
+    assert len(v.split(_orders())) == 4
+    with pytest.raises(ValueError):
+        Validator([{"code": "M", "type": "not_null", "columns": ["profit"], "severity": "error"}]).codes(_orders())
+
+def test_quarantine_output(tmp_path):
+    rules = [{"code": "MISSING_SALES", "type": "not_null", "columns": ["sales"], "severity": "error"},
+             {"code": "DISCOUNT_RANGE", "type": "range", "column": "discount", "max": 0.25, "severity": "error"}]
+    v = Validator(rules, QuarantineSink(str(tmp_path), "orders"))
+    clean = pd.concat([v.split(_orders(sales=[1.0, np.nan, 3.0, 4.0])), v.split(_orders(sales=[np.nan] + [1.0] * 3))])
+    assert clean["order_id"].tolist() == ["A", "C", "B", "C"]
+    out = pd.read_csv(v.sink.path)
+    assert out["order_id"].tolist() == ["B", "D", "A", "D"]
+    assert out[REASON_COLUMN].tolist() == ["MISSING_SALES", "DISCOUNT_RANGE", "MISSING_SALES", "DISCOUNT_RANGE"]
+    both = Validator(rules).reasons(Validator(rules).codes(_orders(sales=[np.nan] * 4)))
+    assert both[3] == "MISSING_SALES;DISCOUNT_RANGE"
+    assert v.summary()["quarantined"] == 4 and v.summary()["quarantine_path"] == v.sink.path
+
+def test_load_rules(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text("rules:\n  - {code: A, type: not_null, column: x}\n"
+                    "  - {code: B, type: compare, left: x, op: '<', right: y, severity: warn}\n")
+    rules = load_rules(str(path))
+    assert [r["severity"] for r in rules] == ["error", "warn"]
+    for bad in ["{code: A, type: nope, column: x}", "{code: A, type: not_null, column: x, severity: fatal}",
+                "{code: A, type: compare, left: x, op: '=>', right: y}"]:
+        path.write_text(f"rules:\n  - {bad}\n")
+        with pytest.raises(ValueError):
+            load_rules(str(path))
+
+def test_repo_rules_load():
+    codes = [r["code"] for r in load_rules("etl/quality_rules.yaml")]
+    assert "DUPLICATE_ROW_ID" in codes and len(codes) == len(set(codes))
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scatter import cell_quotas, stratified_sample, downsample
+
+def _rows(n: int, seed: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"discount": rng.choice([0, 0.1, 0.2, 0.4, 0.7], n),
+                         "profit": rng.standard_t(2, n) * 50, "sales": rng.lognormal(4, 1, n)})
+
+@pytest.mark.parametrize("max_points", [0, 1, 30, 39, 40, 41, 200, 1000, 5000])
+def test_sample_respects_budget(max_points):
+    dff = _rows(100_000)
+    out = stratified_sample(dff, max_points, bins=40)
+    assert len(out) == max_points
+
+def test_sample_keeps_extremes():
+    dff = _rows(50_000)
+    out = stratified_sample(dff, 400, bins=40)
+    for col in ["profit", "sales"]:
+        assert out[col].max() == dff[col].max() and out[col].min() == dff[col].min()
+
+def test_small_frame_untouched():
+    dff = _rows(100)
+    assert stratified_sample(dff, 100, bins=40) is dff
+    assert downsample(dff, 100, "sample", 40) == ("rows", dff)
+
+@pytest.mark.parametrize("budget", [0, 2, 3, 10, 57, 1000])
+def test_cell_quotas(budget):
+    counts = np.array([0, 500, 3, 1, 0, 40, 2])
+    quota = cell_quotas(counts, budget)
+    assert quota.sum() == min(budget, counts.sum())
+    assert (quota <= counts).all()
+    if budget >= (counts > 0).sum():
+        assert (quota[counts > 0] >= 1).all()
+    else:
+        # budget serré : cellules les plus peuplées d'abord
+        assert quota[1] == (budget >= 1) and quota[2] == (budget >= 3)
+
+@pytest.fixture(scope="module")
+def memory_backend():
+    from backends import MemoryBackend, FILTER_DIMS, SCATTER_COLS
+    from column_store import ColumnStore
+    rng = np.random.default_rng(4)
+    n = 60_000
+    rows = _rows(n, seed=4).assign(
+        order_date=pd.Timestamp("2012-01-01") + pd.to_timedelta(rng.integers(0, 3 * 365, n), unit="D"),
+        **{c: rng.choice(["a", "b", "c"], n) for c in FILTER_DIMS},
+        **{c: [f"{c}-{i}" for i in rng.integers(0, 500, n)] for c in SCATTER_COLS[3:] if c not in FILTER_DIMS})
+    backend = MemoryBackend.__new__(MemoryBackend)   # sans base ni jeu publié
+    backend.rows = ColumnStore(rows, FILTER_DIMS, "order_date")
+    return backend
+
+@pytest.mark.parametrize("filters,lo,hi", [({}, None, None), ({}, "2013-02-01", "2013-02-20"),
+                                           ({"market": ["a"], "segment": ["b", "c"]}, "2012-06-01", None),
+                                           ({"market": ["a"]}, "2013-02-01", "2013-02-05")])
+@pytest.mark.parametrize("mode", ["bin", "sample"])
+def test_memory_scatter_matches_full_selection(memory_backend, filters, lo, hi, mode):
+    # mêmes résultats qu'un échantillonnage sur toutes les colonnes de la sélection
+    from backends import SCATTER_COLS
+    kind, payload, n = memory_backend.scatter(filters, lo, hi, 1000, mode, 40)
+    full = memory_backend.filter_rows(filters, lo, hi, SCATTER_COLS)
+    ref_kind, ref = downsample(full, 1000, mode, 40)
+    assert (kind, n) == (ref_kind, len(full))
+    if kind == "grid":
+        np.testing.assert_array_equal(payload["count"], ref["count"])
+        np.testing.assert_allclose(payload["sales"], ref["sales"])
+    else:
+        pd.testing.assert_frame_equal(payload.reset_index(drop=True), ref.reset_index(drop=True))
+        assert list(payload.columns) == SCATTER_COLS